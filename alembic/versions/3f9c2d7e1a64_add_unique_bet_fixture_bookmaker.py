@@ -0,0 +1,29 @@
+"""Add unique bet fixture bookmaker constraint
+
+Revision ID: 3f9c2d7e1a64
+Revises: 243acb21cc72
+Create Date: 2026-10-18 10:12:41.208315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2d7e1a64'
+down_revision = '243acb21cc72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # keep only the latest bet of every bookmaker for a fixture
+    op.execute(
+        'DELETE FROM bet a USING bet b '
+        'WHERE a.fixture_id = b.fixture_id AND a.bookmaker = b.bookmaker AND a.id < b.id'
+    )
+    op.create_unique_constraint('uq_bet_fixture_id_bookmaker', 'bet', ['fixture_id', 'bookmaker'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_bet_fixture_id_bookmaker', 'bet', type_='unique')
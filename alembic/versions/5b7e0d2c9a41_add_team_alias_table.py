@@ -0,0 +1,39 @@
+"""Add team alias table
+
+Revision ID: 5b7e0d2c9a41
+Revises: 3f9c2d7e1a64
+Create Date: 2026-10-18 11:02:17.530148
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e0d2c9a41'
+down_revision = '3f9c2d7e1a64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('team_alias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('bookmaker', sa.String(length=255), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('team_source_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('bookmaker', 'name', name='uq_team_alias_bookmaker_name')
+    )
+    op.create_index(op.f('ix_team_alias_created_at'), 'team_alias', ['created_at'], unique=False)
+    op.create_index(op.f('ix_team_alias_updated_at'), 'team_alias', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_team_alias_team_source_id'), 'team_alias', ['team_source_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_team_alias_team_source_id'), table_name='team_alias')
+    op.drop_index(op.f('ix_team_alias_updated_at'), table_name='team_alias')
+    op.drop_index(op.f('ix_team_alias_created_at'), table_name='team_alias')
+    op.drop_table('team_alias')
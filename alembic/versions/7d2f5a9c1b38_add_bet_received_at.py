@@ -0,0 +1,25 @@
+"""Add bet received_at
+
+Revision ID: 7d2f5a9c1b38
+Revises: e6b14f9a0c3d
+Create Date: 2026-10-18 18:41:05.203517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2f5a9c1b38'
+down_revision = 'e6b14f9a0c3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL for existing bets, the next event of every bet sets it
+    op.add_column('bet', sa.Column('received_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('bet', 'received_at')
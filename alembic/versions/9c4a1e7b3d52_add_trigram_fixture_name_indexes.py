@@ -0,0 +1,42 @@
+"""Add trigram fixture name indexes
+
+Revision ID: 9c4a1e7b3d52
+Revises: 5b7e0d2c9a41
+Create Date: 2026-10-18 11:47:05.118726
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4a1e7b3d52'
+down_revision = '5b7e0d2c9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    # unaccent() depends on the search_path and is only stable, so it can't be used in an index.
+    # the wrapper pins the dictionary, which makes it safe to declare immutable
+    op.execute(
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;"
+    )
+    op.execute(
+        'CREATE INDEX ix_fixture_home_team_name_trgm ON fixture '
+        'USING gin (f_unaccent(home_team_name) gin_trgm_ops);'
+    )
+    op.execute(
+        'CREATE INDEX ix_fixture_away_team_name_trgm ON fixture '
+        'USING gin (f_unaccent(away_team_name) gin_trgm_ops);'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_fixture_away_team_name_trgm', table_name='fixture')
+    op.drop_index('ix_fixture_home_team_name_trgm', table_name='fixture')
+    op.execute('DROP FUNCTION IF EXISTS f_unaccent(text);')
+    op.execute('DROP EXTENSION IF EXISTS pg_trgm;')
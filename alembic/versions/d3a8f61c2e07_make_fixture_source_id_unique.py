@@ -0,0 +1,51 @@
+"""Make fixture source id unique
+
+Revision ID: d3a8f61c2e07
+Revises: 9c4a1e7b3d52
+Create Date: 2026-10-18 12:31:44.902361
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f61c2e07'
+down_revision = '9c4a1e7b3d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # keep the newest fixture of every source id, bets and notifications of the others are moved to it
+    op.execute(
+        'CREATE TEMPORARY TABLE fixture_duplicate AS '
+        'SELECT f.id, k.keep_id FROM fixture f '
+        'JOIN (SELECT source_id, max(id) AS keep_id FROM fixture GROUP BY source_id HAVING count(*) > 1) k '
+        'ON f.source_id = k.source_id AND f.id <> k.keep_id'
+    )
+    # only the latest bet of a bookmaker survives the move
+    op.execute(
+        'DELETE FROM bet WHERE id IN ('
+        'SELECT id FROM ('
+        'SELECT b.id, row_number() OVER ('
+        'PARTITION BY coalesce(d.keep_id, b.fixture_id), b.bookmaker ORDER BY b.id DESC'
+        ') AS n FROM bet b LEFT JOIN fixture_duplicate d ON d.id = b.fixture_id '
+        'WHERE coalesce(d.keep_id, b.fixture_id) IN (SELECT keep_id FROM fixture_duplicate)'
+        ') ranked WHERE n > 1)'
+    )
+    op.execute('UPDATE bet SET fixture_id = d.keep_id FROM fixture_duplicate d WHERE bet.fixture_id = d.id')
+    op.execute(
+        'UPDATE notification SET fixture_id = d.keep_id FROM fixture_duplicate d '
+        'WHERE notification.fixture_id = d.id'
+    )
+    op.execute('DELETE FROM fixture USING fixture_duplicate d WHERE fixture.id = d.id')
+    op.execute('DROP TABLE fixture_duplicate')
+
+    op.drop_index('ix_fixture_source_id', table_name='fixture')
+    op.create_index(op.f('ix_fixture_source_id'), 'fixture', ['source_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_fixture_source_id'), table_name='fixture')
+    op.create_index(op.f('ix_fixture_source_id'), 'fixture', ['source_id'], unique=False)
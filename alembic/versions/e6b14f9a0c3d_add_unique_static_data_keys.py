@@ -0,0 +1,60 @@
+"""Add unique static data keys
+
+Revision ID: e6b14f9a0c3d
+Revises: d3a8f61c2e07
+Create Date: 2026-10-18 15:02:17.418093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b14f9a0c3d'
+down_revision = 'd3a8f61c2e07'
+branch_labels = None
+depends_on = None
+
+
+def merge_duplicates(table: str, key: list[str], references: list[tuple[str, str]]) -> None:
+    """Keep the newest row of every key, references (table, column) to the others are moved to it"""
+    columns = ', '.join(key)
+    join = ' AND '.join(f't.{column} = k.{column}' for column in key)
+    op.execute(
+        f'CREATE TEMPORARY TABLE {table}_duplicate AS '
+        f'SELECT t.id, k.keep_id FROM {table} t '
+        f'JOIN (SELECT {columns}, max(id) AS keep_id FROM {table} GROUP BY {columns} HAVING count(*) > 1) k '
+        f'ON {join} AND t.id <> k.keep_id'
+    )
+    for ref_table, ref_column in references:
+        op.execute(
+            f'UPDATE {ref_table} SET {ref_column} = d.keep_id FROM {table}_duplicate d '
+            f'WHERE {ref_table}.{ref_column} = d.id'
+        )
+    op.execute(f'DELETE FROM {table} USING {table}_duplicate d WHERE {table}.id = d.id')
+    op.execute(f'DROP TABLE {table}_duplicate')
+
+
+def upgrade() -> None:
+    # leagues are merged before their seasons, so the seasons of a league end up with the same league_id
+    merge_duplicates('country', ['name'], [('team', 'country_id')])
+    merge_duplicates('league', ['source_id'], [('fixture', 'league_id'), ('season', 'league_id')])
+    merge_duplicates('team', ['source_id'], [('fixture', 'home_team_id'), ('fixture', 'away_team_id')])
+    merge_duplicates('bookmaker', ['source_id'], [])
+    merge_duplicates('season', ['league_id', 'year'], [])
+
+    op.create_unique_constraint('uq_country_name', 'country', ['name'])
+    op.create_unique_constraint('uq_season_league_id_year', 'season', ['league_id', 'year'])
+
+    for table in ('league', 'team', 'bookmaker'):
+        op.drop_index(f'ix_{table}_source_id', table_name=table)
+        op.create_index(op.f(f'ix_{table}_source_id'), table, ['source_id'], unique=True)
+
+
+def downgrade() -> None:
+    for table in ('league', 'team', 'bookmaker'):
+        op.drop_index(op.f(f'ix_{table}_source_id'), table_name=table)
+        op.create_index(op.f(f'ix_{table}_source_id'), table, ['source_id'], unique=False)
+
+    op.drop_constraint('uq_season_league_id_year', 'season', type_='unique')
+    op.drop_constraint('uq_country_name', 'country', type_='unique')
@@ -1,6 +1,7 @@
 import datetime
 import logging
-from contextlib import asynccontextmanager
+import time
+from contextlib import asynccontextmanager, contextmanager
 
 import httpx
 
@@ -15,32 +16,51 @@ from oddsapi.apifootball.apiclient import (
     get_fixtures_by_date,
 )
 from oddsapi.database.init import SessionLocal
+from oddsapi.database.redis_connection import (
+    redis_connect,
+    RedisDB,
+    FIXTURE_UPDATES_CHANNEL,
+)
 from oddsapi.database.repository.bet import delete_all_bets, upsert_apifootball_bet
 from oddsapi.database.repository.bookmaker import (
-    upsert_bookmaker,
+    upsert_bookmakers,
     delete_all_bookmakers,
 )
 from oddsapi.database.repository.country import (
     find_all_countries,
     delete_all_countries,
-    upsert_country,
+    upsert_countries,
 )
-from oddsapi.database.repository.fixture import delete_all_fixtures, upsert_fixture, \
+from oddsapi.database.repository.fixture import delete_all_fixtures, upsert_fixtures, \
     get_fixture_count
-from oddsapi.database.repository.league import delete_all_leagues, upsert_league, get_league_count
-from oddsapi.database.repository.team import upsert_team, delete_all_teams
+from oddsapi.database.repository.league import delete_all_leagues, upsert_leagues, get_league_count, \
+    get_league_ids
+from oddsapi.database.repository.team import upsert_teams, delete_all_teams
+from oddsapi.helpers import time_now
+from oddsapi.parser_import.deadletter import rematch_dead_letters
 from oddsapi.settings import (
     APIFOOTBALL_BOOKMAKERS,
     FIXTURE_PARSE_DAYS,
     BET_PARSE_DAYS,
     DISABLE_PROXY,
+    IMPORT_COPY,
 )
 
 
+@contextmanager
+def log_duration(entity: str):
+    """Log how long the import of an entity took"""
+    started_at = time.perf_counter()
+    yield
+    logging.info(f"Imported {entity} in {time.perf_counter() - started_at:.2f}s.")
+
+
 class ApiFootballLoader:
-    def __init__(self, session, client):
+    def __init__(self, session, client, copy: bool = False):
         self.session = session
         self.client = client
+        # load rows through a COPY staging table, faster for large imports
+        self.copy = copy
 
     async def load_bets(self, delete=False):
         if delete:
@@ -77,13 +97,20 @@ class ApiFootballLoader:
         days = FIXTURE_PARSE_DAYS
         dates = [(date_now + day * i).strftime("%Y-%m-%d") for i in range(days)]
 
+        league_ids = await get_league_ids(self.session)
+
+        fixtures = []
         for date in dates:
-            fixtures = await get_fixtures_by_date(self.client, date)
-            for fixture in fixtures:
-                await upsert_fixture(fixture, self.session)
+            fixtures.extend(await get_fixtures_by_date(self.client, date))
+
+        inserted, updated = await upsert_fixtures(
+            fixtures, league_ids, self.session, copy=self.copy
+        )
 
         await self.session.commit()
 
+        logging.info(f"Imported fixtures: {inserted} new, {updated} updated.")
+
     async def load_bookmakers(self, delete=False):
         bookmakers = await get_bookmakers(self.client)
 
@@ -91,14 +118,13 @@ class ApiFootballLoader:
             logging.info("Delete flag passed. Deleting existing bookmakers...")
             await delete_all_bookmakers(self.session)
 
-        bookmaker_count = 0
-        for bookmaker in bookmakers:
-            await upsert_bookmaker(bookmaker, self.session)
-            bookmaker_count += 1
+        inserted, updated = await upsert_bookmakers(
+            bookmakers, self.session, copy=self.copy
+        )
 
         await self.session.commit()
 
-        logging.info(f"Imported {bookmaker_count} bookmakers.")
+        logging.info(f"Imported bookmakers: {inserted} new, {updated} updated.")
 
     async def load_teams(self, delete=False):
         if delete:
@@ -109,13 +135,16 @@ class ApiFootballLoader:
         if not countries:
             logging.warning("No countries found. Can't import teams...")
 
+        teams = {}
         for country in countries:
-            teams = await get_teams_by_country(self.client, country.name)
-            for team in teams:
-                await upsert_team(team, country.id, self.session)
+            teams[country.id] = await get_teams_by_country(self.client, country.name)
+
+        inserted, updated = await upsert_teams(teams, self.session, copy=self.copy)
 
         await self.session.commit()
 
+        logging.info(f"Imported teams: {inserted} new, {updated} updated.")
+
     async def load_countries(self, delete=False):
         if delete:
             logging.info("Delete flag passed. Deleting existing countries...")
@@ -123,14 +152,13 @@ class ApiFootballLoader:
 
         countries = await get_countries(self.client)
 
-        country_count = 0
-        for country in countries:
-            await upsert_country(country, self.session)
-            country_count += 1
+        inserted, updated = await upsert_countries(
+            countries, self.session, copy=self.copy
+        )
 
         await self.session.commit()
 
-        logging.info(f"Imported {country_count} countries.")
+        logging.info(f"Imported countries: {inserted} new, {updated} updated.")
 
     async def load_leagues(self, delete=False):
         if delete:
@@ -139,35 +167,53 @@ class ApiFootballLoader:
 
         leagues = await get_leagues(self.client)
 
-        league_count = 0
-        for league in leagues:
-            await upsert_league(league, self.session)
-            league_count += 1
+        inserted, updated = await upsert_leagues(
+            leagues, self.session, copy=self.copy
+        )
 
         await self.session.commit()
 
-        logging.info(f"Imported {league_count} leagues.")
+        logging.info(f"Imported leagues: {inserted} new, {updated} updated.")
 
 
 @asynccontextmanager
-async def apifootball_context():
+async def apifootball_context(copy: bool = False):
     httpx_conf = get_httpx_config(disable_proxy=DISABLE_PROXY)
     async with SessionLocal() as session, httpx.AsyncClient(**httpx_conf) as client:
-        yield ApiFootballLoader(session, client)
+        yield ApiFootballLoader(session, client, copy)
+
 
+async def publish_fixture_updates():
+    """Let the parser listeners know that new fixtures have been imported"""
+    redis = redis_connect(RedisDB.PARSERS)
+    await redis.publish(FIXTURE_UPDATES_CHANNEL, time_now().isoformat())
+    await redis.close()
 
-async def load_matches(delete=False):
-    async with apifootball_context() as loader:  # type: ApiFootballLoader
-        await loader.load_fixtures(delete)
+
+async def load_matches(delete=False, copy=IMPORT_COPY):
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    async with apifootball_context(copy) as loader:  # type: ApiFootballLoader
+        with log_duration("fixtures"):
+            await loader.load_fixtures(delete)
         # await loader.load_bets(delete)
 
+    redis = redis_connect(RedisDB.PARSERS)
+    await rematch_dead_letters(redis, started_at)
+    await redis.close()
+
+    await publish_fixture_updates()
+
 
-async def load_static(delete=False):
-    async with apifootball_context() as loader:  # type: ApiFootballLoader
-        await loader.load_leagues(delete)
-        await loader.load_countries(delete)
-        await loader.load_bookmakers(delete)
-        await loader.load_teams(delete)
+async def load_static(delete=False, copy=IMPORT_COPY):
+    async with apifootball_context(copy) as loader:  # type: ApiFootballLoader
+        with log_duration("leagues"):
+            await loader.load_leagues(delete)
+        with log_duration("countries"):
+            await loader.load_countries(delete)
+        with log_duration("bookmakers"):
+            await loader.load_bookmakers(delete)
+        with log_duration("teams"):
+            await loader.load_teams(delete)
 
 
 # load matches and bets if they are not already in the database
@@ -178,5 +224,6 @@ async def autoimport():
 
     if league_count == 0 or fixture_count == 0:
         logging.info("No leagues or fixtures found. Importing initial data...")
-        await load_static()
-        await load_matches()
+        # the tables are empty, every row is new
+        await load_static(copy=True)
+        await load_matches(copy=True)
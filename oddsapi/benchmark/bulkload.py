@@ -0,0 +1,199 @@
+"""Compare the ways the api import writes rows on synthetic teams and fixtures.
+
+    pdm run bench-bulkload --teams 20000 --fixtures 50000
+
+orm selects and adds every row like the import used to, insert writes multi-row
+upserts and copy loads a staging table with COPY and merges it with one upsert.
+Every mode imports the rows into empty tables and then again with every row changed.
+Rows are written to the postgres from .env with negative source ids and deleted
+afterwards, so it refuses to run with APP_ENV=prod.
+"""
+
+import argparse
+import asyncio
+import datetime
+import sys
+import time
+
+from sqlalchemy import select, delete
+
+from oddsapi.database.init import SessionLocal, get_engine
+from oddsapi.database.models import Country, League, Team, Fixture
+from oddsapi.database.repository.bulk import upsert_rows, count_written
+from oddsapi.database.repository.fixture import fixture_row
+from oddsapi.database.repository.team import team_row
+from oddsapi.settings import APP_ENV
+
+# source ids of the benchmark rows start below the ones used by bench-replay
+SOURCE_ID_OFFSET = -1_000_000
+BENCH_NAME = "Bulkload benchmark"
+
+MODES = ("orm", "insert", "copy")
+
+
+def teams_data(count: int, version: int) -> list[dict]:
+    """/teams response items, every version changes all of them"""
+    return [
+        {
+            "team": {
+                "id": SOURCE_ID_OFFSET - number,
+                "name": f"Team {number} v{version}",
+                "code": None,
+                "logo": f"https://example.com/teams/{number}.png",
+                "founded": 1900 + version,
+                "national": False,
+            }
+        }
+        for number in range(count)
+    ]
+
+
+def fixtures_data(count: int, version: int) -> list[dict]:
+    """/fixtures response items, every version changes all of them"""
+    date = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+    return [
+        {
+            "fixture": {
+                "id": SOURCE_ID_OFFSET - number,
+                "timezone": "UTC",
+                "date": (date + datetime.timedelta(minutes=version)).isoformat(),
+            },
+            "league": {"id": SOURCE_ID_OFFSET, "season": date.year},
+            "teams": {
+                "home": {
+                    "id": SOURCE_ID_OFFSET - 2 * number,
+                    "name": f"Home {number}",
+                    "logo": "",
+                },
+                "away": {
+                    "id": SOURCE_ID_OFFSET - 2 * number - 1,
+                    "name": f"Away {number}",
+                    "logo": "",
+                },
+            },
+        }
+        for number in range(count)
+    ]
+
+
+async def orm_upsert(model, rows: list[dict], key: list[str], session) -> int:
+    """Select every row by its key and add it to the session"""
+    for row in rows:
+        stmt = select(model).filter_by(**{column: row[column] for column in key})
+        obj = (await session.scalars(stmt)).first() or model()
+        for column, value in row.items():
+            setattr(obj, column, value)
+        session.add(obj)
+
+    return len(rows)
+
+
+async def write(mode: str, model, rows: list[dict], key: list[str]) -> float:
+    """Time in seconds of writing and committing rows"""
+    async with SessionLocal() as session:
+        start = time.perf_counter()
+        if mode == "orm":
+            await orm_upsert(model, rows, key, session)
+        else:
+            written = await upsert_rows(model, rows, key, session, copy=mode == "copy")
+            inserted, updated = count_written(written)
+            if inserted + updated != len(rows):
+                print(f"{mode}: wrote {inserted + updated} of {len(rows)} rows")
+        await session.commit()
+
+        return time.perf_counter() - start
+
+
+async def setup() -> tuple[int, int]:
+    """Ids of the benchmark country and league, created if they don't exist"""
+    async with SessionLocal() as session:
+        country = (
+            await session.scalars(select(Country).where(Country.name == BENCH_NAME))
+        ).first()
+        if not country:
+            country = Country(name=BENCH_NAME)
+            session.add(country)
+
+        stmt = select(League).where(League.source_id == SOURCE_ID_OFFSET)
+        league = (await session.scalars(stmt)).first()
+        if not league:
+            league = League(
+                source_id=SOURCE_ID_OFFSET, name=BENCH_NAME, type="League", logo=""
+            )
+            session.add(league)
+
+        await session.commit()
+
+        return country.id, league.id
+
+
+async def cleanup(teardown: bool = False):
+    async with SessionLocal() as session:
+        await session.execute(
+            delete(Fixture).where(Fixture.source_id <= SOURCE_ID_OFFSET)
+        )
+        await session.execute(delete(Team).where(Team.source_id <= SOURCE_ID_OFFSET))
+        if teardown:
+            await session.execute(
+                delete(League).where(League.source_id == SOURCE_ID_OFFSET)
+            )
+            await session.execute(delete(Country).where(Country.name == BENCH_NAME))
+        await session.commit()
+
+
+async def bench(team_count: int, fixture_count: int, modes: list[str]):
+    country_id, league_id = await setup()
+    league_ids = {SOURCE_ID_OFFSET: league_id}
+
+    tables = {
+        "teams": (
+            Team,
+            [
+                [team_row(data, country_id) for data in teams_data(team_count, version)]
+                for version in range(2)
+            ],
+        ),
+        "fixtures": (
+            Fixture,
+            [
+                [
+                    fixture_row(data, league_ids[data["league"]["id"]])
+                    for data in fixtures_data(fixture_count, version)
+                ]
+                for version in range(2)
+            ],
+        ),
+    }
+
+    try:
+        for mode in modes:
+            await cleanup()
+            for name, (model, versions) in tables.items():
+                # the first import inserts every row, the second one updates every row
+                for action, rows in zip(("insert", "update"), versions):
+                    if not rows:
+                        continue
+
+                    seconds = await write(mode, model, rows, ["source_id"])
+                    print(
+                        f"{mode:>6} {action} {len(rows)} {name}: {seconds:.2f}s, "
+                        f"{len(rows) / seconds:.0f} rows/s"
+                    )
+    finally:
+        await cleanup(teardown=True)
+        await get_engine().dispose()
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--teams", type=int, default=20000)
+    parser.add_argument("--fixtures", type=int, default=50000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    if APP_ENV == "prod":
+        sys.exit("bulkload writes to the configured db, set APP_ENV=dev")
+
+    asyncio.run(bench(args.teams, args.fixtures, args.modes))
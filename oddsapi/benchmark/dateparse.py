@@ -0,0 +1,106 @@
+"""Compare the date parsing of the listeners (ISO 8601, memoized dateparser)
+with plain dateparser on recorded queue payloads (one raw json payload per line).
+
+    pdm run bench-dateparse payloads.jsonl
+
+--verify fails if any recorded ISO 8601 date parses differently than with dateparser.
+strptime formats per bookmaker are deferred until payloads of every parser are recorded
+and checked, formats like "%d.%m.%Y" read some dates differently than dateparser.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+import dateparser
+
+from oddsapi.parser_import.dateparse import (
+    parse_event_datetime,
+    parse_iso,
+    _dateparser_parse,
+)
+
+
+def read_datetimes(path: str) -> list[str]:
+    with open(path) as f:
+        return [json.loads(line)["datetime"] for line in f if line.strip()]
+
+
+def bench(func, values: list[str], repeat: int) -> float:
+    """Best time in seconds of parsing all values"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            func(value)
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("payloads", help="file with one recorded payload per line")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="exit with an error if a date parses differently than with dateparser",
+    )
+    args = parser.parse_args()
+
+    values = read_datetimes(args.payloads)
+    if not values:
+        print("No payloads found")
+        return
+
+    fast_path_hits = 0
+    mismatches = {}
+    for value, count in Counter(values).items():
+        fast = parse_iso(value)
+        if fast:
+            fast_path_hits += count
+            expected = dateparser.parse(value)
+            if fast != expected:
+                mismatches[value] = (fast, expected)
+
+    if args.verify:
+        for value, (fast, expected) in sorted(mismatches.items())[:20]:
+            print(f"{value!r}: fast path {fast}, dateparser {expected}")
+        if mismatches:
+            sys.exit(
+                f"{len(mismatches)} of {len(set(values))} unique dates parse differently "
+                f"as ISO 8601"
+            )
+
+        print(
+            f"All {fast_path_hits} of {len(values)} dates parsed as ISO 8601 "
+            f"match dateparser"
+        )
+        return
+
+    dateparser_time = bench(dateparser.parse, values, args.repeat)
+
+    _dateparser_parse.cache_clear()
+    listener_time = bench(parse_event_datetime, values, args.repeat)
+
+    count = len(values)
+    print(f"Payloads: {count}, unique dates: {len(set(values))}")
+    print(
+        f"Fast path hits: {fast_path_hits / count:.1%}, "
+        f"different from dateparser: {len(mismatches)} unique dates"
+    )
+    print(
+        f"dateparser: {dateparser_time:.3f}s ({dateparser_time / count * 1e6:.1f} us/event)"
+    )
+    print(
+        f"listener:   {listener_time:.3f}s ({listener_time / count * 1e6:.1f} us/event)"
+    )
+    print(f"Speedup: {dateparser_time / listener_time:.1f}x")
@@ -0,0 +1,79 @@
+"""Check that the fuzzy fixture search can use the trigram indexes of the fixture names.
+
+    pdm run explain-fixture-search "Manchester United" "Liverpool"
+
+Runs EXPLAIN of the ilike and similarity queries of the listener against the
+postgres from .env and exits with 1 if either plan doesn't use the trigram indexes.
+Sequential scans are disabled for the check, a small table is always scanned otherwise.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+
+from oddsapi.database.init import get_engine
+from oddsapi.database.repository.fixture import (
+    fixture_ilike_stmt,
+    fixture_similar_stmt,
+)
+
+TRGM_INDEXES = {"ix_fixture_home_team_name_trgm", "ix_fixture_away_team_name_trgm"}
+
+
+def plan_indexes(plan: dict) -> set[str]:
+    """Names of the indexes used anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    indexes = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        indexes |= plan_indexes(child)
+
+    return indexes
+
+
+async def explain(home_team: str, away_team: str, date: datetime.datetime) -> bool:
+    engine = get_engine()
+
+    passed = True
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("SET enable_seqscan = off")
+
+        for name, stmt in (
+            ("ilike", fixture_ilike_stmt(home_team, away_team, date)),
+            ("similarity", fixture_similar_stmt(home_team, away_team, date)),
+        ):
+            compiled = stmt.compile(dialect=engine.dialect)
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+            )
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+
+            indexes = plan_indexes(plan[0]["Plan"])
+            used = indexes & TRGM_INDEXES
+            print(f"{name}: uses {sorted(indexes) or 'no indexes'}")
+            if not used:
+                passed = False
+
+    await engine.dispose()
+
+    return passed
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("home_team")
+    parser.add_argument("away_team")
+    parser.add_argument(
+        "--date",
+        type=datetime.datetime.fromisoformat,
+        default=datetime.datetime.now(),
+        help="kickoff date of the searched event, defaults to today",
+    )
+    args = parser.parse_args()
+
+    if not asyncio.run(explain(args.home_team, args.away_team, args.date)):
+        sys.exit("The fixture search doesn't use the trigram indexes")
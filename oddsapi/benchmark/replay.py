@@ -0,0 +1,575 @@
+"""Record parser queue payloads and replay them into a listener running in
+this process to measure throughput, per-event latency and time per stage.
+
+    pdm run bench-replay record fonbet payloads.jsonl --count 5000
+    pdm run bench-replay replay fonbet payloads.jsonl --rate 200
+    pdm run bench-replay soak fonbet payloads.jsonl --rate 200 --duration 14400
+
+record copies payloads from the queue (or stream) without consuming them.
+replay pushes the payloads to a `bench:` prefixed queue in a redis db of its own
+and writes bets to the postgres from .env, so it refuses to run with APP_ENV=prod.
+Queues, caches and bets of the listeners are never touched. Fixtures matching
+the recorded events are created in a separate league that is recreated on every
+replay, events are only matched to the fixtures of that league.
+soak replays the payloads in a loop for duration seconds and samples the RSS
+of the process, memory of a long-running listener should stay flat.
+"""
+
+import argparse
+import asyncio
+import copy
+import datetime
+import math
+import resource
+import statistics
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Type
+
+import msgspec
+from sqlalchemy import select, delete
+
+from oddsapi.benchmark.wire import read_payloads
+from oddsapi.database.init import SessionLocal
+from oddsapi.database.models import Bet, Fixture, League, TeamAlias
+from oddsapi.database.redis_connection import redis_connect, RedisDB
+from oddsapi.parser_import.cache import EventUrlCache, OddsHashCache
+from oddsapi.parser_import.dateparse import parse_event_datetime
+from oddsapi.parser_import.listener import LISTENERS, ParserListener
+from oddsapi.parser_import.normalize import clean_name
+from oddsapi.parser_import.transport import ListTransport, stream_key, EventBatch
+from oddsapi.parser_import.wire import MSGPACK_VERSION, REQUEUED_VERSION
+from oddsapi.settings import APP_ENV, LISTENER_PIPELINE, LISTENER_ADAPTIVE_BATCHING
+
+# source id of the league that holds the fixtures created for replays
+REPLAY_LEAGUE_SOURCE_ID = -1
+
+# prefix of the queue name of replays. The queue name is also the bookmaker of the bets
+# and the namespace of the redis keys, so replays never share them with the listeners
+BENCH_QUEUE_PREFIX = "bench:"
+
+# time in seconds between pushes of a rate limited replay
+PUSH_INTERVAL = 0.01
+
+# latencies kept by a soak test, older ones are dropped so they don't add to the RSS
+SOAK_LATENCY_WINDOW = 100_000
+
+
+async def record(bookmaker: str, path: str, count: int, duration: float):
+    """Save up to count distinct payloads that pass through the queue within duration"""
+    listener = LISTENERS[bookmaker]()
+    queue = listener.event_queue
+    redis = listener.redis
+
+    is_stream = await redis.type(stream_key(queue)) == b"stream"
+
+    seen = set()
+    deadline = time.monotonic() + duration
+    with open(path, "wb") as f:
+        while len(seen) < count and time.monotonic() < deadline:
+            if is_stream:
+                entries = await redis.xrevrange(stream_key(queue), count=count)
+                payloads = [fields.get(b"data") for _, fields in entries]
+            else:
+                payloads = await redis.lrange(queue, 0, count - 1)
+
+            for payload in payloads:
+                if not payload or payload in seen:
+                    continue
+
+                seen.add(payload)
+                # one json payload per line
+                if (
+                    payload[:1] in (MSGPACK_VERSION, REQUEUED_VERSION)
+                    or b"\n" in payload
+                ):
+                    payload = msgspec.json.encode(listener.decode_event(payload))
+
+                f.write(payload + b"\n")
+                if len(seen) >= count:
+                    break
+
+            await asyncio.sleep(1)
+
+    print(f"Recorded {len(seen)} payloads of {queue} to {path}")
+
+
+async def seed_fixtures(listener: ParserListener, payloads: list[bytes]) -> int:
+    """Recreate the replay league with a fixture for every upcoming recorded event"""
+    time_now = datetime.datetime.now(datetime.timezone.utc)
+
+    fixtures = {}
+    for event in listener.decode_events(payloads):
+        date = parse_event_datetime(event.datetime)
+        if not date:
+            continue
+
+        # naive dates are local time, same as in the listener
+        date = date.astimezone()
+        if date <= time_now:
+            continue
+
+        # stored the same way the fixture import stores names
+        home_team = clean_name(event.home_team_name)
+        away_team = clean_name(event.away_team_name)
+        fixtures[(home_team, away_team, date.date())] = date
+
+    # negative source ids per team name, so team aliases can tell the teams apart
+    team_ids = {}
+    for home_team, away_team, _ in fixtures:
+        for team in (home_team, away_team):
+            team_ids.setdefault(team, -len(team_ids) - 1)
+
+    async with SessionLocal() as session:
+        stmt = select(League).where(League.source_id == REPLAY_LEAGUE_SOURCE_ID)
+        league = (await session.scalars(stmt)).first()
+        # bets of replays, in case one ever matched a fixture of another league
+        await session.execute(
+            delete(Bet).where(Bet.bookmaker.like(f"{BENCH_QUEUE_PREFIX}%"))
+        )
+        if league:
+            fixture_ids = select(Fixture.id).where(Fixture.league_id == league.id)
+            await session.execute(delete(Bet).where(Bet.fixture_id.in_(fixture_ids)))
+            await session.execute(delete(Fixture).where(Fixture.league_id == league.id))
+            # aliases learned by previous replays
+            await session.execute(delete(TeamAlias).where(TeamAlias.team_source_id < 0))
+        else:
+            league = League(
+                source_id=REPLAY_LEAGUE_SOURCE_ID, name="Replay", type="League", logo=""
+            )
+            session.add(league)
+            await session.flush()
+
+        session.add_all(
+            Fixture(
+                source_id=-number,
+                timezone="UTC",
+                date=date,
+                league_season=date.year,
+                league_id=league.id,
+                home_team_name=home_team,
+                home_team_source_id=team_ids[home_team],
+                home_team_logo="",
+                away_team_name=away_team,
+                away_team_source_id=team_ids[away_team],
+                away_team_logo="",
+            )
+            for number, ((home_team, away_team, _), date) in enumerate(
+                fixtures.items(), start=1
+            )
+        )
+        await session.commit()
+
+    return len(fixtures)
+
+
+async def load_replay_fixtures(listener: ParserListener, session) -> set[int]:
+    """Fill the fixture index with the fixtures of the replay league only.
+    Returns their ids"""
+    stmt = (
+        select(Fixture)
+        .join(League, Fixture.league_id == League.id)
+        .where(League.source_id == REPLAY_LEAGUE_SOURCE_ID)
+    )
+    fixture_ids = set()
+    for fixture in await session.scalars(stmt):
+        listener.fixture_index.add(
+            fixture.id,
+            fixture.date,
+            fixture.home_team_name,
+            fixture.away_team_name,
+            fixture.home_team_source_id,
+            fixture.away_team_source_id,
+        )
+        fixture_ids.add(fixture.id)
+
+    return fixture_ids
+
+
+async def reset_redis(listener: ParserListener):
+    """Remove the replay queue and the cached matches and odds of the replay"""
+    if not listener.event_queue.startswith(BENCH_QUEUE_PREFIX):
+        raise ValueError(f"{listener.event_queue} is not a benchmark queue")
+
+    await listener.redis.delete(listener.event_queue)
+    await delete_cache(listener, EventUrlCache.key_prefix)
+    await delete_cache(listener, OddsHashCache.key_prefix)
+
+
+async def delete_cache(listener: ParserListener, prefix: str):
+    redis = listener.redis
+    keys = [key async for key in redis.scan_iter(f"{prefix}:{listener.event_queue}:*")]
+    if keys:
+        await redis.delete(*keys)
+
+
+def replay_listener_cls(listener_cls: Type[ParserListener]):
+    """Listener that records the time from pushing every payload to committing its batch"""
+
+    class ReplayListener(listener_cls):
+        # number of latest latencies kept, None keeps all of them
+        latency_window: int | None = None
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # push times of the payloads in the queue. Equal payloads are interchangeable
+            self.pushed_at: dict[bytes, deque[float]] = defaultdict(deque)
+            self.latencies: deque[float] = deque(maxlen=self.latency_window)
+            self.processed = 0
+            self.expected = 0
+            self.finished = asyncio.Event()
+            # fixtures of the replay league, the only ones events are matched to
+            self.replay_fixture_ids: set[int] = set()
+
+        @property
+        def event_queue(self) -> str:
+            return BENCH_QUEUE_PREFIX + super().event_queue
+
+        async def find_fixture_db(self, event, event_date, session):
+            # the db search runs as usual, but fixtures of other leagues are dropped
+            fixture = await super().find_fixture_db(event, event_date, session)
+            if fixture and fixture.id not in self.replay_fixture_ids:
+                self.fixture_index.remove(fixture.id)
+                return None
+
+            return fixture
+
+        async def write_batch(self, batch: EventBatch, *args, **kwargs):
+            await super().write_batch(batch, *args, **kwargs)
+
+            done_at = time.perf_counter()
+            for raw in batch.events:
+                self.latencies.append(done_at - self.pushed_at[raw].popleft())
+            self.processed += len(batch.events)
+
+            if self.processed >= self.expected:
+                self.finished.set()
+
+    return ReplayListener
+
+
+async def push_events(listener, payloads: list[bytes], rate: float):
+    """Push payloads to the listener queue, rate events per second or all at once"""
+    chunk_size = max(int(rate * PUSH_INTERVAL), 1) if rate else 1000
+
+    start = time.perf_counter()
+    for offset in range(0, len(payloads), chunk_size):
+        if rate:
+            delay = start + offset / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        chunk = payloads[offset : offset + chunk_size]
+        pushed_at = time.perf_counter()
+        for raw in chunk:
+            listener.pushed_at[raw].append(pushed_at)
+
+        await listener.redis.lpush(listener.event_queue, *chunk)
+
+
+async def setup_replay(
+    bookmaker: str,
+    path: str,
+    batch_size: int | None,
+    batch_max_wait: float | None,
+    consumers: int | None,
+    pipeline: bool,
+    adaptive_batching: bool,
+    latency_window: int | None = None,
+):
+    """Listener ready to consume the recorded payloads, with matching fixtures seeded.
+    Returns the listener, the payloads and the number of seeded fixtures"""
+    listener_cls = replay_listener_cls(LISTENERS[bookmaker])
+    listener_cls.adaptive_batching = adaptive_batching
+    listener_cls.latency_window = latency_window
+    listener = listener_cls(
+        batch_size=batch_size,
+        batch_max_wait=batch_max_wait,
+        consumers=consumers,
+        redis=redis_connect(RedisDB.BENCHMARK),
+    )
+    listener.pipelined = pipeline
+    # the replay always pushes to the list queue
+    listener.transport = ListTransport(
+        listener.redis,
+        [listener.event_queue],
+        listener.batch_size,
+        listener.batch_max_wait,
+    )
+
+    payloads = read_payloads(path)
+    seeded = await seed_fixtures(listener, payloads)
+    await reset_redis(listener)
+
+    async with SessionLocal() as session:
+        listener.replay_fixture_ids = await load_replay_fixtures(listener, session)
+
+    # seeding decoded the payloads too
+    listener.stats = copy.deepcopy(ParserListener.stats)
+    listener.timer.reset()
+
+    return listener, payloads, seeded
+
+
+async def replay(
+    bookmaker: str,
+    path: str,
+    rate: float,
+    repeat: int,
+    batch_size: int | None,
+    batch_max_wait: float | None,
+    consumers: int | None,
+    pipeline: bool,
+    adaptive_batching: bool,
+):
+    listener, payloads, seeded = await setup_replay(
+        bookmaker,
+        path,
+        batch_size,
+        batch_max_wait,
+        consumers,
+        pipeline,
+        adaptive_batching,
+    )
+    payloads = payloads * repeat
+    listener.expected = len(payloads)
+
+    print(
+        f"Replaying {len(payloads)} events of {listener.event_queue} "
+        f"({seeded} fixtures seeded), rate: {rate or 'max'}, "
+        f"batch size: {listener.batch_size}, consumers: {listener.consumers}, "
+        f"pipelined: {listener.pipelined}, adaptive batching: {adaptive_batching}"
+    )
+
+    consumers = asyncio.create_task(listener.process_events())
+    if listener.batching:
+        batching = asyncio.create_task(listener.batching.run(listener.transport))
+    start = time.perf_counter()
+    await push_events(listener, payloads, rate)
+
+    finished = asyncio.create_task(listener.finished.wait())
+    await asyncio.wait([finished, consumers], return_when=asyncio.FIRST_COMPLETED)
+    elapsed = time.perf_counter() - start
+
+    if consumers.done():
+        # a consumer crashed, raise its exception
+        consumers.result()
+    consumers.cancel()
+    if listener.batching:
+        batching.cancel()
+
+    report(listener, elapsed)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes, linux only"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+async def soak(
+    bookmaker: str,
+    path: str,
+    rate: float,
+    duration: float,
+    sample_interval: float,
+    batch_size: int | None,
+    batch_max_wait: float | None,
+    consumers: int | None,
+    pipeline: bool,
+    adaptive_batching: bool,
+):
+    """Replay the payloads at rate events per second for duration seconds
+    and report the RSS of the process every sample_interval seconds"""
+    listener, payloads, seeded = await setup_replay(
+        bookmaker,
+        path,
+        batch_size,
+        batch_max_wait,
+        consumers,
+        pipeline,
+        adaptive_batching,
+        latency_window=SOAK_LATENCY_WINDOW,
+    )
+    # never finishes on its own
+    listener.expected = math.inf
+
+    print(
+        f"Soaking {listener.event_queue} with {len(payloads)} events "
+        f"({seeded} fixtures seeded) at {rate} events/s for {duration:.0f}s"
+    )
+
+    async def push_loop():
+        while True:
+            await push_events(listener, payloads, rate)
+            # every pass writes the bets again instead of skipping unchanged odds
+            await delete_cache(listener, OddsHashCache.key_prefix)
+
+    tasks = [
+        asyncio.create_task(listener.process_events()),
+        asyncio.create_task(push_loop()),
+    ]
+    if listener.batching:
+        tasks.append(asyncio.create_task(listener.batching.run(listener.transport)))
+
+    samples = []
+    start = time.perf_counter()
+    try:
+        while time.perf_counter() - start < duration:
+            done, _ = await asyncio.wait(tasks, timeout=sample_interval)
+            for task in done:
+                # a consumer or the push loop crashed, raise its exception
+                task.result()
+
+            rss = current_rss()
+            samples.append(rss)
+            print(
+                f"{(time.perf_counter() - start) / 60:6.1f} min: "
+                f"RSS {rss / 2**20:7.1f} MiB, events: {listener.processed}"
+            )
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    report(listener, time.perf_counter() - start)
+
+    if len(samples) > 2:
+        # the first samples include warming up the caches
+        baseline = samples[len(samples) // 10]
+        growth = samples[-1] - baseline
+        print(
+            f"RSS growth after warmup: {growth / 2**20:+.1f} MiB "
+            f"({growth / baseline:+.1%}), max {max(samples) / 2**20:.1f} MiB"
+        )
+
+
+def report(listener, elapsed: float):
+    count = listener.processed
+    stats = listener.stats
+    print(
+        f"Events: {count}, added: {stats['added']}, updated: {stats['updated']}, "
+        f"unchanged: {stats['unchanged']}, errors: {stats['errors']}"
+    )
+    print(f"Throughput: {count / elapsed:.0f} events/s ({elapsed:.2f}s)")
+
+    if len(listener.latencies) > 1:
+        percentiles = statistics.quantiles(listener.latencies, n=100)
+        print(
+            f"Latency: p50 {percentiles[49] * 1000:.1f} ms, "
+            f"p99 {percentiles[98] * 1000:.1f} ms, "
+            f"max {max(listener.latencies) * 1000:.1f} ms"
+        )
+
+    if listener.batching:
+        print(f"Batching at the end: {listener.batching.summary()}")
+
+    # stages of concurrent consumers overlap, so they can add up to more than elapsed
+    print("Stage time:")
+    for stage in ("decode", "dateparse", "match", "upsert", "commit"):
+        seconds = listener.timer.seconds.get(stage, 0)
+        print(
+            f"  {stage:<10} {seconds * 1000:8.1f} ms total, "
+            f"{seconds / count * 1e6:8.1f} us/event, "
+            f"{listener.timer.calls.get(stage, 0)} calls"
+        )
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="record queue payloads")
+    record_parser.add_argument("bookmaker", choices=LISTENERS.keys())
+    record_parser.add_argument("payloads", help="file to write the payloads to")
+    record_parser.add_argument("--count", type=int, default=1000)
+    record_parser.add_argument(
+        "--duration", type=float, default=60, help="max time to record in seconds"
+    )
+
+    # listener options shared by replay and soak
+    listener_options = argparse.ArgumentParser(add_help=False)
+    listener_options.add_argument("bookmaker", choices=LISTENERS.keys())
+    listener_options.add_argument("payloads", help="file with one payload per line")
+    listener_options.add_argument("--batch-size", type=int)
+    listener_options.add_argument("--batch-max-wait", type=float)
+    listener_options.add_argument("--consumers", type=int)
+    listener_options.add_argument(
+        "--pipeline",
+        action=argparse.BooleanOptionalAction,
+        default=LISTENER_PIPELINE,
+        help="overlap popping and decoding with db writes",
+    )
+    listener_options.add_argument(
+        "--adaptive-batching",
+        action=argparse.BooleanOptionalAction,
+        default=LISTENER_ADAPTIVE_BATCHING,
+        help="adapt the batch size to the queue lag, --batch-size is the max",
+    )
+
+    replay_parser = commands.add_parser(
+        "replay", parents=[listener_options], help="replay recorded payloads"
+    )
+    replay_parser.add_argument(
+        "--rate", type=float, default=0, help="events per second, 0 pushes all at once"
+    )
+    replay_parser.add_argument(
+        "--repeat", type=int, default=1, help="replay the payloads this many times"
+    )
+
+    soak_parser = commands.add_parser(
+        "soak",
+        parents=[listener_options],
+        help="replay recorded payloads in a loop and sample the memory usage",
+    )
+    soak_parser.add_argument(
+        "--rate", type=float, default=100, help="events per second"
+    )
+    soak_parser.add_argument(
+        "--duration", type=float, default=4 * 3600, help="time to run in seconds"
+    )
+    soak_parser.add_argument(
+        "--sample-interval",
+        type=float,
+        default=60,
+        help="time in seconds between RSS samples",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        asyncio.run(record(args.bookmaker, args.payloads, args.count, args.duration))
+        return
+
+    if APP_ENV == "prod":
+        sys.exit("replay writes to the configured redis and db, set APP_ENV=dev")
+
+    listener_args = (
+        args.batch_size,
+        args.batch_max_wait,
+        args.consumers,
+        args.pipeline,
+        args.adaptive_batching,
+    )
+
+    if args.command == "soak":
+        if args.rate <= 0:
+            sys.exit("soak needs a positive --rate")
+
+        asyncio.run(
+            soak(
+                args.bookmaker,
+                args.payloads,
+                args.rate,
+                args.duration,
+                args.sample_interval,
+                *listener_args,
+            )
+        )
+        return
+
+    asyncio.run(
+        replay(args.bookmaker, args.payloads, args.rate, args.repeat, *listener_args)
+    )
@@ -0,0 +1,68 @@
+"""Compare size and decode time of recorded json queue payloads
+(one raw json payload per line) with the MessagePack wire format.
+
+    pdm run bench-wire fonbet payloads.jsonl
+"""
+
+import argparse
+
+import msgspec
+
+from oddsapi.benchmark.dateparse import bench
+from oddsapi.parser_import.listener import LISTENERS
+from oddsapi.parser_import.wire import EventDecoder, encode_msgpack
+
+
+def read_payloads(path: str) -> list[bytes]:
+    with open(path, "rb") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("bookmaker", choices=LISTENERS.keys())
+    parser.add_argument("payloads", help="file with one recorded payload per line")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    event_cls = LISTENERS[args.bookmaker]().event_cls
+    decoder = EventDecoder(event_cls)
+
+    json_payloads = []
+    for payload in read_payloads(args.payloads):
+        try:
+            decoder.decode(payload)
+        except msgspec.DecodeError:
+            continue
+
+        json_payloads.append(payload)
+
+    if not json_payloads:
+        print("No valid payloads found")
+        return
+
+    # the parser would encode its own data, odds are numbers on the wire
+    msgpack_payloads = [
+        encode_msgpack(decoder.decode(payload)) for payload in json_payloads
+    ]
+
+    count = len(json_payloads)
+    json_size = sum(len(payload) for payload in json_payloads)
+    msgpack_size = sum(len(payload) for payload in msgpack_payloads)
+
+    json_time = bench(decoder.decode, json_payloads, args.repeat)
+    msgpack_time = bench(decoder.decode, msgpack_payloads, args.repeat)
+
+    print(f"Payloads: {count}")
+    print(
+        f"json:    {json_size / 1024:.1f} KiB ({json_size / count:.0f} bytes/event), "
+        f"{json_time / count * 1e6:.1f} us/event"
+    )
+    print(
+        f"msgpack: {msgpack_size / 1024:.1f} KiB ({msgpack_size / count:.0f} bytes/event), "
+        f"{msgpack_time / count * 1e6:.1f} us/event"
+    )
+    print(
+        f"msgpack is {msgpack_size / json_size:.0%} of the json size, "
+        f"decodes {json_time / msgpack_time:.1f}x faster"
+    )
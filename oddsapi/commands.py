@@ -1,9 +1,18 @@
+import argparse
 import asyncio
 
 import sentry_sdk
 import uvloop
 
-from oddsapi.database.clean import clean_notify, clean_matches, clean_static, clean_all
+from oddsapi.database.clean import (
+    clean_notify,
+    clean_matches,
+    clean_static,
+    clean_all,
+    clean_team_aliases,
+    clean_match_caches,
+)
+from oddsapi.database.init import use_engine_profile
 from oddsapi.helpers import configure_logging
 from oddsapi.apifootball.loader import load_static, load_matches, autoimport
 from oddsapi.parser_import.listener import (
@@ -11,8 +20,10 @@ from oddsapi.parser_import.listener import (
     MarathonListener,
     FonbetListener,
     BetcityListener,
+    MultiQueueListener,
+    LISTENERS,
 )
-from oddsapi.settings import SENTRY_DSN
+from oddsapi.settings import SENTRY_DSN, LISTENER_QUEUES
 from oddsapi.tgbot.tgbot import run_tg_notify, tgbot
 
 configure_logging()
@@ -29,37 +40,50 @@ if SENTRY_DSN:
 
 
 def import_matches():
+    use_engine_profile("worker")
     asyncio.run(load_matches())
 
 
 def import_static():
+    use_engine_profile("worker")
     asyncio.run(load_static())
 
 
 def import_autoimport():
+    use_engine_profile("worker")
     asyncio.run(autoimport())
 
 
 def betcity_listener(debug: bool = False):
+    use_engine_profile("listener")
     listener = BetcityListener(debug=debug)
     asyncio.run(listener.start())
 
 
 def fonbet_listener(debug: bool = False):
+    use_engine_profile("listener")
     listener = FonbetListener(debug=debug)
     asyncio.run(listener.start())
 
 
 def pinnacle_listener(debug: bool = False):
+    use_engine_profile("listener")
     listener = PinnacleListener(debug=debug)
     asyncio.run(listener.start())
 
 
 def marathon_listener(debug: bool = False):
+    use_engine_profile("listener")
     listener = MarathonListener(debug=debug)
     asyncio.run(listener.start())
 
 
+def parsers_listener():
+    use_engine_profile("listener")
+    listener = MultiQueueListener([LISTENERS[queue] for queue in LISTENER_QUEUES])
+    asyncio.run(listener.start())
+
+
 def delete_notify():
     asyncio.run(clean_notify())
 
@@ -76,9 +100,28 @@ def delete_all():
     asyncio.run(clean_all())
 
 
+def clear_match_caches():
+    asyncio.run(clean_match_caches())
+
+
+def delete_team_aliases():
+    parser = argparse.ArgumentParser(
+        description="Delete learned team aliases of a bookmaker, all of them "
+        "unless a name or team is given"
+    )
+    parser.add_argument("bookmaker", choices=LISTENERS)
+    parser.add_argument("--name", help="team name as spelled by the bookmaker")
+    parser.add_argument("--team", type=int, help="team source id")
+    args = parser.parse_args()
+
+    asyncio.run(clean_team_aliases(args.bookmaker, args.name, args.team))
+
+
 def telegram_notify():
+    use_engine_profile("bot")
     asyncio.run(run_tg_notify())
 
 
 def run_tgbot():
+    use_engine_profile("bot")
     asyncio.run(tgbot())
@@ -1,4 +1,7 @@
+import logging
+
 from oddsapi.database.init import SessionLocal
+from oddsapi.database.redis_connection import redis_connect, RedisDB
 from oddsapi.database.repository.bet import delete_all_bets
 from oddsapi.database.repository.bookmaker import delete_all_bookmakers
 from oddsapi.database.repository.country import delete_all_countries
@@ -6,6 +9,9 @@ from oddsapi.database.repository.fixture import delete_all_fixtures
 from oddsapi.database.repository.league import delete_all_leagues
 from oddsapi.database.repository.notification import delete_notifications
 from oddsapi.database.repository.team import delete_all_teams
+from oddsapi.database.repository.team_alias import delete_team_aliases
+from oddsapi.parser_import.cache import clear_match_caches
+from oddsapi.parser_import.normalize import normalize_name
 
 
 async def clean_static():
@@ -20,6 +26,19 @@ async def clean_matches():
     async with SessionLocal() as session:
         await delete_all_bets(session)
         await delete_all_fixtures(session)
+        await session.commit()
+
+    # cached matches of the listeners point to the deleted fixtures
+    await clean_match_caches()
+
+
+async def clean_match_caches():
+    """Delete cached event matches and odds digests of the listeners, needed
+    after fixtures are deleted or merged outside of clean_matches"""
+    redis = redis_connect(RedisDB.PARSERS)
+    deleted = await clear_match_caches(redis)
+    await redis.close()
+    logging.info(f"Deleted {deleted} cached event matches and odds digests")
 
 
 async def clean_notify():
@@ -32,3 +51,20 @@ async def clean_all():
     await clean_notify()
     await clean_matches()
     await clean_static()
+
+
+async def clean_team_aliases(
+    bookmaker: str, name: str | None = None, team_source_id: int | None = None
+):
+    """Delete wrong team aliases of a bookmaker. Running listeners forget them
+    on their next reload of the aliases"""
+    async with SessionLocal() as session:
+        deleted = await delete_team_aliases(
+            bookmaker,
+            session,
+            name=normalize_name(name) if name is not None else None,
+            team_source_id=team_source_id,
+        )
+        await session.commit()
+
+    logging.info(f"Deleted {deleted} team aliases of {bookmaker}")
@@ -1,103 +1,114 @@
-from dataclasses import dataclass
-from typing import Optional
+import msgspec
 
+# parsers send odds as strings or numbers, they are converted to floats while decoding
+OddsValue = float | str | None
 
-@dataclass
-class TotalOdds:
-    total: str
-    total_under: str
-    total_over: str
+# some bookmakers use a non-breaking hyphen or a unicode minus in handicaps
+MINUS_SIGNS = str.maketrans({"‑": "-", "−": "-"})
 
 
-@dataclass
-class HandicapOdds:
-    handicap: str
-    coef: str
+def parse_odds(value: OddsValue) -> float | None:
+    """Odds value as a float. Empty strings and values that aren't numbers
+    (e.g. "-" for suspended odds) are missing odds. Decimal commas are accepted"""
+    if isinstance(value, str):
+        value = value.translate(MINUS_SIGNS).strip().replace(",", ".")
+        if not value:
+            return None
+
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    return value
+
+
+class TotalOdds(msgspec.Struct, omit_defaults=True):
+    # None for totals keyed by the total value, it's filled in from the key
+    total: OddsValue = None
+    total_over: OddsValue = None
+    total_under: OddsValue = None
+
+    def __post_init__(self):
+        self.total = parse_odds(self.total)
+        self.total_over = parse_odds(self.total_over)
+        self.total_under = parse_odds(self.total_under)
+
+
+class HandicapOdds(msgspec.Struct, omit_defaults=True):
+    handicap: OddsValue
+    coef: OddsValue
     type: str
 
+    def __post_init__(self):
+        self.handicap = parse_odds(self.handicap)
+        self.coef = parse_odds(self.coef)
 
-@dataclass
-class OutcomeOdds:
-    draw: str
-    home_win: str
-    away_win: str
 
+class OutcomeOdds(msgspec.Struct, omit_defaults=True):
+    home_team: OddsValue = None
+    draw: OddsValue = None
+    away_team: OddsValue = None
 
-@dataclass(slots=False)
-class CommonEvent:
-    event_url: str
-    datetime: str
-    home_team_name: str
-    away_team_name: str
-    outcome_odds: OutcomeOdds
-    first_half_outcome_odds: OutcomeOdds | None
-    second_half_outcome_odds: OutcomeOdds | None
-    handicap_odds: object | None
-    first_half_handicap_odds: object | None
-    total_odds: list[TotalOdds] | None
-    first_half_total_odds: list[TotalOdds] | None
-    name: Optional[str] = None
-
-
-@dataclass(slots=False)
-class BetcityEvent:
-    event_url: str
-    datetime: str
-    home_team_name: str
-    away_team_name: str
-    outcome_odds: OutcomeOdds
-    first_half_outcome_odds: OutcomeOdds | None
-    second_half_outcome_odds: OutcomeOdds | None
-    handicap_odds: object | None
-    first_half_handicap_odds: object | None
-    total_odds: list[TotalOdds] | None
-    first_half_total_odds: list | None
-    name: Optional[str] = None
-
-
-@dataclass(slots=False)
-class FonbetEvent:
-    event_url: str
-    datetime: str
-    home_team_name: str
-    away_team_name: str
-    outcome_odds: OutcomeOdds
-    first_half_outcome_odds: OutcomeOdds | None
-    second_half_outcome_odds: OutcomeOdds | None
-    handicap_odds: object | None
-    first_half_handicap_odds: object | None
-    total_odds: list[TotalOdds] | None
-    first_half_total_odds: list[TotalOdds] | None
-    name: Optional[str] = None
-
-
-@dataclass(slots=False)
-class PinnacleEvent:
-    event_url: str
-    datetime: str
-    home_team_name: str
-    away_team_name: str
-    outcome_odds: OutcomeOdds
-    first_half_outcome_odds: OutcomeOdds | None
-    second_half_outcome_odds: OutcomeOdds | None
-    handicap_odds: object | None
-    first_half_handicap_odds: object | None
-    total_odds: list | None
-    first_half_total_odds: list | None
-    name: Optional[str] = None
-
-
-@dataclass(slots=False)
-class MarathonEvent:
-    event_url: str
+    def __post_init__(self):
+        self.home_team = parse_odds(self.home_team)
+        self.draw = parse_odds(self.draw)
+        self.away_team = parse_odds(self.away_team)
+
+    def __bool__(self):
+        # parsers send an empty object if there are no odds
+        return any(
+            odds is not None for odds in (self.home_team, self.draw, self.away_team)
+        )
+
+
+def keyed_totals(totals: list[TotalOdds] | dict[str, TotalOdds] | None):
+    """Totals as a list. Some parsers send an object keyed by the total value"""
+    if not isinstance(totals, dict):
+        return totals
+
+    result = []
+    for key, value in totals.items():
+        value.total = parse_odds(key)
+        result.append(value)
+
+    return result
+
+
+class ParserEvent(msgspec.Struct, omit_defaults=True):
+    """Event pushed by a parser. Payloads that don't match the schema
+    are rejected by the decoder before the listener does any work"""
+
+    event_url: str | None
     datetime: str
     home_team_name: str
     away_team_name: str
     outcome_odds: OutcomeOdds
-    first_half_outcome_odds: OutcomeOdds | None
-    second_half_outcome_odds: OutcomeOdds | None
-    handicap_odds: dict | None
-    first_half_handicap_odds: object | None
-    total_odds: list | None
-    first_half_total_odds: list | None
-    name: Optional[str] = None
+    first_half_outcome_odds: OutcomeOdds | None = None
+    second_half_outcome_odds: OutcomeOdds | None = None
+    handicap_odds: list[HandicapOdds] | None = None
+    first_half_handicap_odds: list[HandicapOdds] | None = None
+    total_odds: list[TotalOdds] | dict[str, TotalOdds] | None = None
+    first_half_total_odds: list[TotalOdds] | dict[str, TotalOdds] | None = None
+    name: str | None = None
+
+    def __post_init__(self):
+        self.total_odds = keyed_totals(self.total_odds)
+        self.first_half_total_odds = keyed_totals(self.first_half_total_odds)
+
+
+class BetcityEvent(ParserEvent):
+    total_odds: list[TotalOdds] | None = None
+
+
+class FonbetEvent(ParserEvent):
+    total_odds: list[TotalOdds] | None = None
+    first_half_total_odds: list[TotalOdds] | None = None
+
+
+class PinnacleEvent(ParserEvent):
+    pass
+
+
+class MarathonEvent(ParserEvent):
+    pass
@@ -1,8 +1,136 @@
-from sqlalchemy import QueuePool
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import AsyncAdaptedQueuePool, NullPool, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase
 
-from oddsapi.settings import DATABASE_CONNECTION, DB_ECHO
+from oddsapi.settings import (
+    DATABASE_CONNECTION,
+    DB_ECHO,
+    DB_PGBOUNCER,
+    LISTENER_CONSUMERS,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class EngineProfile:
+    """Connection pool and session settings of one kind of process"""
+
+    # None doesn't pool connections, every session opens a new one
+    pool_size: int | None
+    max_overflow: int = 0
+    # seconds to wait for a free connection before failing
+    pool_timeout: float = 30
+    # check connections before using them, for processes that idle for minutes
+    pool_pre_ping: bool = False
+    # milliseconds, 0 disables
+    statement_timeout: int = 0
+    # executions of a query before psycopg prepares it on the server, None never prepares
+    prepare_threshold: int | None = 5
+    # prepared statements kept per connection
+    prepared_max: int = 100
+
+
+ENGINE_PROFILES = {
+    # scripts and anything that doesn't pick a profile
+    "default": EngineProfile(pool_size=10, max_overflow=10),
+    # a handful of statements run by every consumer task over and over
+    "listener": EngineProfile(
+        pool_size=LISTENER_CONSUMERS + 2,
+        max_overflow=2,
+        pool_timeout=10,
+        statement_timeout=30_000,
+        prepare_threshold=2,
+        prepared_max=200,
+    ),
+    # imports run every few minutes and can take a while
+    "worker": EngineProfile(pool_size=2, max_overflow=2, pool_pre_ping=True),
+    # runs every request in a new event loop, pooled connections can't be reused
+    "ui": EngineProfile(
+        pool_size=None, statement_timeout=60_000, prepare_threshold=None
+    ),
+    "bot": EngineProfile(
+        pool_size=2, max_overflow=1, pool_pre_ping=True, statement_timeout=30_000
+    ),
+}
+
+
+class PoolWaitStats:
+    """Time sessions spent waiting for a connection of the pool,
+    including opening new connections"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.checkouts += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection.
+    The stats are shared by all pools of the process"""
+
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.observe(time.perf_counter() - start)
+
+
+def create_engine(profile_name: str) -> AsyncEngine:
+    profile = ENGINE_PROFILES[profile_name]
+
+    connect_args = {
+        "application_name": f"oddsapi-{profile_name}",
+        "prepare_threshold": profile.prepare_threshold,
+    }
+    pool_args = {}
+
+    if DB_PGBOUNCER:
+        # pgbouncer pools the connections. In transaction mode prepared statements
+        # and startup options don't survive between transactions, timeouts are set on the db role
+        connect_args["prepare_threshold"] = None
+        pool_args["poolclass"] = NullPool
+    else:
+        if profile.statement_timeout:
+            connect_args["options"] = (
+                f"-c statement_timeout={profile.statement_timeout}"
+            )
+
+        if profile.pool_size is None:
+            pool_args["poolclass"] = NullPool
+        else:
+            pool_args = {
+                "poolclass": TimedQueuePool,
+                "pool_size": profile.pool_size,
+                "max_overflow": profile.max_overflow,
+                "pool_timeout": profile.pool_timeout,
+                "pool_pre_ping": profile.pool_pre_ping,
+            }
+
+    profile_engine = create_async_engine(
+        DATABASE_CONNECTION, echo=DB_ECHO, connect_args=connect_args, **pool_args
+    )
+
+    if connect_args["prepare_threshold"] is not None:
+
+        @event.listens_for(profile_engine.sync_engine, "connect")
+        def set_prepared_max(dbapi_connection, connection_record):
+            dbapi_connection.driver_connection.prepared_max = profile.prepared_max
+
+    return profile_engine
+
 
 engine = None
 
@@ -13,12 +141,7 @@ def get_engine():
     if engine:
         return engine
 
-    engine = create_async_engine(
-        DATABASE_CONNECTION,
-        echo=DB_ECHO,
-        pool_size=10,
-        poolclass=QueuePool,
-    )
+    engine = create_engine("default")
     return engine
 
 
@@ -27,5 +150,32 @@ engine = get_engine()
 SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 
+def use_engine_profile(profile_name: str) -> AsyncEngine:
+    """Replace the engine of SessionLocal with one of the given profile.
+    Has to be called when the process starts, before the first session is opened"""
+    global engine
+
+    engine = create_engine(profile_name)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+def pool_stats() -> dict:
+    """Checkouts and their wait time since the last call, and the current pool usage"""
+    stats = TimedQueuePool.wait_stats
+    summary = {
+        "checkouts": stats.checkouts,
+        "wait_avg": round(stats.total / stats.checkouts, 4) if stats.checkouts else 0,
+        "wait_max": round(stats.max, 4),
+    }
+    stats.reset()
+
+    if isinstance(engine.pool, TimedQueuePool):
+        summary["checked_out"] = engine.pool.checkedout()
+        summary["overflow"] = max(engine.pool.overflow(), 0)
+
+    return summary
+
+
 class Base(DeclarativeBase):
     pass
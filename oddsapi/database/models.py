@@ -11,6 +11,7 @@ from sqlalchemy import (
     Boolean,
     func,
     Index,
+    UniqueConstraint,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.mutable import MutableDict, MutableList
@@ -42,6 +43,9 @@ class Bet(Base):
     source_update: Mapped[datetime] = mapped_column(
         DateTime(True), default=text("CURRENT_TIMESTAMP"), index=True, nullable=True
     )
+    # time the parser event that last wrote the bet entered redis,
+    # older events don't overwrite it
+    received_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=True)
     bookmaker: Mapped[str] = mapped_column(String(255), index=True)
     home_win: Mapped[float] = mapped_column(Numeric(12, 6), index=True, nullable=True)
     away_win: Mapped[float] = mapped_column(Numeric(12, 6), index=True, nullable=True)
@@ -77,6 +81,7 @@ class Bet(Base):
     )
 
     __table_args__ = (
+        UniqueConstraint("fixture_id", "bookmaker", name="uq_bet_fixture_id_bookmaker"),
         Index("idx_gin_totals", totals, postgresql_using="gin"),
         Index("idx_gin_first_half_totals", first_half_totals, postgresql_using="gin"),
         Index("idx_gin_handicaps", handicaps, postgresql_using="gin"),
@@ -110,7 +115,9 @@ class Bookmaker(Base):
         default=func.now(),
         onupdate=func.now(),
     )
-    source_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    source_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, index=True, unique=True
+    )
 
     name: Mapped[str] = mapped_column(String(255), index=True)
 
@@ -140,12 +147,16 @@ class Country(Base):
 
     teams: Mapped[list["Team"]] = relationship("Team", back_populates="country")
 
+    __table_args__ = (UniqueConstraint("name", name="uq_country_name"),)
+
 
 class Fixture(Base):
     __tablename__ = "fixture"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    source_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    source_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, index=True, unique=True
+    )
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(True),
@@ -211,12 +222,29 @@ class Fixture(Base):
             "draw": self.condition_draw,
         }
 
+    __table_args__ = (
+        # trigram indexes of the unaccented names for the fuzzy fixture search,
+        # f_unaccent is an immutable unaccent() wrapper created by the migration
+        Index(
+            "ix_fixture_home_team_name_trgm",
+            text("f_unaccent(home_team_name) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+        Index(
+            "ix_fixture_away_team_name_trgm",
+            text("f_unaccent(away_team_name) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+    )
+
 
 class League(Base):
     __tablename__ = "league"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    source_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    source_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, index=True, unique=True
+    )
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(True),
@@ -303,12 +331,18 @@ class Season(Base):
     )
     league: Mapped["League"] = relationship("League", back_populates="seasons")
 
+    __table_args__ = (
+        UniqueConstraint("league_id", "year", name="uq_season_league_id_year"),
+    )
+
 
 class Team(Base):
     __tablename__ = "team"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    source_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    source_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, index=True, unique=True
+    )
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(True),
@@ -348,3 +382,35 @@ class Team(Base):
         foreign_keys="Fixture.away_team_id",
         back_populates="away_team",
     )
+
+
+class TeamAlias(Base):
+    """Team name as spelled by a bookmaker, learned from matched events"""
+
+    __tablename__ = "team_alias"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(True),
+        nullable=False,
+        index=True,
+        default=func.now(),
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(True),
+        nullable=False,
+        index=True,
+        default=func.now(),
+        onupdate=func.now(),
+    )
+
+    bookmaker: Mapped[str] = mapped_column(String(255))
+    # normalized team name sent by the parser
+    name: Mapped[str] = mapped_column(String(255))
+    # same as Fixture.home_team_source_id/away_team_source_id
+    team_source_id: Mapped[int] = mapped_column(Integer, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("bookmaker", "name", name="uq_team_alias_bookmaker_name"),
+    )
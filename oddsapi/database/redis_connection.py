@@ -10,6 +10,12 @@ class RedisDB(IntEnum):
     WORKER_QUEUE = 0
     MAIN_CACHE = 1
     PARSERS = 2
+    # queues and caches of bench-replay, never used by running listeners
+    BENCHMARK = 3
+
+
+# pub/sub channel that is notified after new fixtures are imported
+FIXTURE_UPDATES_CHANNEL = "fixture_updates"
 
 
 def redis_connect(db=RedisDB.MAIN_CACHE) -> Redis:
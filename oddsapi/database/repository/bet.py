@@ -1,90 +1,147 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import select, delete, func
+import msgspec
+from sqlalchemy import select, delete, func, null, literal_column, Boolean, or_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.functions import now
 
 from oddsapi.database.data_models import (
     BetcityEvent,
     FonbetEvent,
     MarathonEvent,
     PinnacleEvent,
-    CommonEvent,
+    ParserEvent,
 )
 from oddsapi.database.models import Bet, Fixture
 
+BET_ODDS_COLUMNS = (
+    "outcomes",
+    "first_half_outcomes",
+    "second_half_outcomes",
+    "totals",
+    "first_half_totals",
+    "handicaps",
+    "first_half_handicaps",
+)
 
-def normalize_handicaps(handicaps: list[dict]) -> list[dict]:
-    # replace the irregular minus sign
-    for handicap in handicaps:
-        handicap["handicap"] = handicap["handicap"].replace("‑", "-")
-
-        handicap["handicap"] = float(handicap["handicap"])
-
-    return handicaps
-
-
-async def upsert_bet(
-    event: CommonEvent, fixture: Fixture, bookmaker: str, session: AsyncSession
-):
-    bet = None
-    update = False
-    for fixture_bet in fixture.bets:
-        if fixture_bet.bookmaker == bookmaker:
-            logging.info(
-                f"This {bookmaker} bet is already in db for fixture with id {fixture.id}. Updating..."
-            )
-            update = True
-            bet = fixture_bet
-
-    if not bet:
-        update = False
-        bet = Bet()
-        bet.fixture = fixture
-        bet.bookmaker = bookmaker
-        bet.source = "parser"
-        # bet.source_update = datetime
-        bet.event_url = event.event_url
-
-        logging.info(f"Adding bet from betcity for fixture with id {fixture.id}...")
-
-    # bet.home_win = event.home_team
-    # bet.draw = event.draw
-    # bet.away_win = event.away_team
 
-    print(event.total_odds)
-    bet.outcomes = event.outcome_odds
+def get_bet_odds(event: ParserEvent) -> dict:
+    """Bet column values for the odds of a parser event. Empty odds are left out,
+    so they don't overwrite odds that are already stored"""
+    odds = {"outcomes": event.outcome_odds}
 
     # only if it isn't an empty
     if event.total_odds:
         # filter out all the totals where either total_over or total_under are not present
-        # and then map the remaining ones to a list of TotalOdds
-        totals = [
+        odds["totals"] = [
             total
             for total in event.total_odds
-            if total.get("total_over") and total.get("total_under")
+            if total.total_over and total.total_under
         ]
-        bet.totals = totals
 
     if event.handicap_odds:
-        bet.handicaps = normalize_handicaps(event.handicap_odds)
+        odds["handicaps"] = event.handicap_odds
     if event.first_half_handicap_odds:
-        bet.first_half_handicaps = normalize_handicaps(event.first_half_handicap_odds)
+        odds["first_half_handicaps"] = event.first_half_handicap_odds
     # only if it isn't an empty
     if event.first_half_outcome_odds:
-        bet.first_half_outcomes = event.first_half_outcome_odds
+        odds["first_half_outcomes"] = event.first_half_outcome_odds
     if event.second_half_outcome_odds:
-        bet.second_half_outcomes = event.second_half_outcome_odds
+        odds["second_half_outcomes"] = event.second_half_outcome_odds
     if event.first_half_total_odds:
-        bet.first_half_totals = event.first_half_total_odds
+        odds["first_half_totals"] = event.first_half_total_odds
+
+    # jsonb columns take plain dicts and lists
+    return msgspec.to_builtins(odds)
+
+
+async def upsert_bets(bets: list[dict], session: AsyncSession) -> list:
+    """Insert or update parser bets with one INSERT ... ON CONFLICT statement.
+    bets are dicts of Bet column values. Odds columns that are missing or None
+    keep the stored odds. A stored bet is only updated by a bet with the same
+    or a later received_at, so a consumer that commits late can't overwrite newer odds.
+    Returns fixture_id, bookmaker and whether the bet was inserted for every written row,
+    bets that are older than the stored ones are left out
+    """
+    # a statement can't update the same row twice, the newest bet wins
+    unique_bets = {}
+    for bet in bets:
+        bet = {
+            **bet,
+            "received_at": bet.get("received_at") or datetime.now(timezone.utc),
+        }
+        key = (bet["fixture_id"], bet["bookmaker"])
+        if (
+            key not in unique_bets
+            or bet["received_at"] >= unique_bets[key]["received_at"]
+        ):
+            unique_bets[key] = bet
+
+    values = []
+    # rows are locked in the same order by every statement, so concurrent upserts
+    # wait for each other instead of deadlocking
+    for _, bet in sorted(unique_bets.items()):
+        row = {
+            "fixture_id": bet["fixture_id"],
+            "bookmaker": bet["bookmaker"],
+            "source": "parser",
+            "event_url": bet.get("event_url"),
+            "received_at": bet["received_at"],
+        }
+        for column in BET_ODDS_COLUMNS:
+            # sql NULL instead of json null, so that coalesce keeps the stored odds
+            value = bet.get(column)
+            row[column] = value if value is not None else null()
+
+        values.append(row)
+
+    stmt = insert(Bet).values(values)
+
+    update_columns = {
+        column: func.coalesce(stmt.excluded[column], Bet.__table__.c[column])
+        for column in BET_ODDS_COLUMNS
+    }
+    update_columns["received_at"] = stmt.excluded.received_at
+    update_columns["updated_at"] = func.now()
+
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_bet_fixture_id_bookmaker",
+        set_=update_columns,
+        where=or_(
+            Bet.received_at.is_(None),
+            stmt.excluded.received_at >= Bet.received_at,
+        ),
+    ).returning(
+        Bet.fixture_id,
+        Bet.bookmaker,
+        # xmax is only set for rows that existed before the statement
+        literal_column("xmax = 0", Boolean).label("inserted"),
+    )
 
-    session.add(bet)
-    logging.log(
-        5, f"imported bet with fixture id {fixture.id} successfully"
+    rows = (await session.execute(stmt)).all()
+    logging.log(5, f"upserted {len(rows)} bets")
+
+    return rows  # noqa
+
+
+async def find_bet_fixture(
+    bookmaker: str, event_url: str, session: AsyncSession
+) -> tuple[int, datetime] | None:
+    """Find the upcoming fixture that a bookmaker event was already matched to.
+    Returns fixture id and date"""
+    stmt = (
+        select(Bet.fixture_id, Fixture.date)
+        .join(Bet.fixture)
+        .where(
+            (Bet.bookmaker == bookmaker)
+            & (Bet.event_url == event_url)
+            & (Fixture.date > now())
+        )
     )
 
-    return update
-    pass
+    return (await session.execute(stmt)).first()  # noqa
 
 
 async def upsert_apifootball_bet(
@@ -1,26 +1,23 @@
-from sqlalchemy import select, delete
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from oddsapi.database.models import Bookmaker
+from oddsapi.database.repository.bulk import upsert_rows, count_written
 
 
-async def upsert_bookmaker(bookmaker_data: dict, session: AsyncSession):
-    stmt = select(Bookmaker).where(Bookmaker.source_id == bookmaker_data["id"])
-    bookmaker = (await session.scalars(stmt)).first()
-
-    update = True
-    if not bookmaker:
-        update = False
-        bookmaker = Bookmaker()
-        bookmaker.source_id = bookmaker_data["id"]
-
-    bookmaker.name = bookmaker_data["name"]
-
-    session.add(bookmaker)
-
-    return update
+async def upsert_bookmakers(
+    bookmakers_data: list[dict], session: AsyncSession, copy: bool = False
+) -> tuple[int, int]:
+    """Insert or update the bookmakers of a /odds/bookmakers response.
+    Returns the number of inserted and updated bookmakers"""
+    rows = [
+        {"source_id": bookmaker_data["id"], "name": bookmaker_data["name"]}
+        for bookmaker_data in bookmakers_data
+    ]
+    written = await upsert_rows(Bookmaker, rows, ["source_id"], session, copy=copy)
+    return count_written(written)
 
 
 async def delete_all_bookmakers(session: AsyncSession):
     stmt = delete(Bookmaker)
-    await session.execute(stmt)
\ No newline at end of file
+    await session.execute(stmt)
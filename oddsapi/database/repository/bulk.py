@@ -0,0 +1,123 @@
+from typing import Iterable
+
+from sqlalchemy import or_, func, literal_column, Boolean, select, table, column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from oddsapi.database.init import Base
+
+# max rows per insert statement
+UPSERT_CHUNK = 1000
+# postgres allows at most this many bind parameters per statement
+MAX_PARAMETERS = 65535
+
+
+def unique_rows(rows: list[dict], key: list[str]) -> list[dict]:
+    """Rows with distinct keys, the last one wins"""
+    return list({tuple(row[column] for column in key): row for row in rows}.values())
+
+
+def on_conflict_update(stmt, model: type[Base], key: list[str], update_columns):
+    """Update the existing row of the key if one of update_columns changed
+    and return an inserted flag of every written row"""
+    table_ = model.__table__
+    changed = or_(
+        *(
+            table_.c[column].is_distinct_from(stmt.excluded[column])
+            for column in update_columns
+        )
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=key,
+        set_={
+            **{column: stmt.excluded[column] for column in update_columns},
+            "updated_at": func.now(),
+        },
+        where=changed,
+    ).returning(
+        # xmax is only set for rows that existed before the statement
+        literal_column("xmax = 0", Boolean).label("inserted"),
+    )
+
+
+async def upsert_rows(
+    model: type[Base],
+    rows: list[dict],
+    key: list[str],
+    session: AsyncSession,
+    update_columns: Iterable[str] | None = None,
+    copy: bool = False,
+) -> list:
+    """Insert rows or update the existing ones with the same key, one statement per chunk.
+    key has to be covered by a unique index. Rows with the same key are written once,
+    the last one wins. Existing rows are only updated if one of update_columns
+    (all columns but the key by default) changed, so updated_at keeps meaning changed.
+    With copy the rows are loaded with copy_rows instead.
+    Returns the written rows with an inserted flag"""
+    rows = unique_rows(rows, key)
+    if not rows:
+        return []
+
+    if update_columns is None:
+        update_columns = [column for column in rows[0] if column not in key]
+
+    if copy:
+        return await copy_rows(model, rows, key, session, update_columns)
+
+    chunk_size = min(UPSERT_CHUNK, MAX_PARAMETERS // len(rows[0]))
+
+    written = []
+    for offset in range(0, len(rows), chunk_size):
+        stmt = insert(model).values(rows[offset : offset + chunk_size])
+        stmt = on_conflict_update(stmt, model, key, update_columns)
+
+        written.extend(await session.execute(stmt))
+
+    return written
+
+
+async def copy_rows(
+    model: type[Base],
+    rows: list[dict],
+    key: list[str],
+    session: AsyncSession,
+    update_columns: Iterable[str],
+) -> list:
+    """Stream rows with distinct keys into a temporary staging table with COPY
+    and merge it into the table of model with one upsert.
+    Skips the statement size limits and the parameter binding of inserts,
+    worth it for imports of tens of thousands of rows"""
+    columns = list(rows[0])
+    staging = f"{model.__tablename__}_staging"
+
+    conn = await session.connection()
+    quote = conn.dialect.identifier_preparer.quote
+    column_list = ", ".join(quote(column) for column in columns)
+
+    # only the column types are copied, defaults and constraints are applied by the merge
+    await conn.exec_driver_sql(
+        f"CREATE TEMPORARY TABLE {staging} AS "
+        f"SELECT {column_list} FROM {model.__tablename__} WITH NO DATA"
+    )
+
+    # COPY isn't supported by sqlalchemy, it runs on the psycopg connection in the same transaction
+    raw_connection = await conn.get_raw_connection()
+    async with raw_connection.driver_connection.cursor() as cursor:
+        async with cursor.copy(f"COPY {staging} ({column_list}) FROM STDIN") as writer:
+            for row in rows:
+                await writer.write_row([row[column] for column in columns])
+
+    staging_table = table(staging, *(column(name) for name in columns))
+    stmt = insert(model).from_select(columns, select(staging_table))
+    stmt = on_conflict_update(stmt, model, key, update_columns)
+    written = (await session.execute(stmt)).all()
+
+    await conn.exec_driver_sql(f"DROP TABLE {staging}")
+
+    return written
+
+
+def count_written(rows: list) -> tuple[int, int]:
+    """Number of inserted and updated rows returned by upsert_rows"""
+    inserted = sum(1 for row in rows if row.inserted)
+    return inserted, len(rows) - inserted
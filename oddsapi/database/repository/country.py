@@ -2,26 +2,24 @@ from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from oddsapi.database.models import Country
-
-
-async def upsert_country(country_data: dict, session: AsyncSession):
-    update = True
-
-    # sqlalchemy statement to find first country by name
-    stmt = select(Country).where(Country.name == country_data["name"])
-    country = (await session.scalars(stmt)).first()
-
-    if not country:
-        update = False
-        country = Country()
-        country.name = country_data["name"]
-
-    country.code = country_data["code"]
-    country.flag = country_data["flag"]
-
-    session.add(country)
-
-    return update
+from oddsapi.database.repository.bulk import upsert_rows, count_written
+
+
+async def upsert_countries(
+    countries_data: list[dict], session: AsyncSession, copy: bool = False
+) -> tuple[int, int]:
+    """Insert or update the countries of a /countries response by name.
+    Returns the number of inserted and updated countries"""
+    rows = [
+        {
+            "name": country_data["name"],
+            "code": country_data["code"],
+            "flag": country_data["flag"],
+        }
+        for country_data in countries_data
+    ]
+    written = await upsert_rows(Country, rows, ["name"], session, copy=copy)
+    return count_written(written)
 
 
 async def find_all_countries(session: AsyncSession):
@@ -33,4 +31,4 @@ async def find_all_countries(session: AsyncSession):
 
 async def delete_all_countries(session: AsyncSession):
     stmt = delete(Country)
-    await session.execute(stmt)
\ No newline at end of file
+    await session.execute(stmt)
@@ -1,150 +1,149 @@
 import logging
-import re
 from datetime import datetime
 
 from sqlalchemy import select, text, delete
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.functions import now
 from sqlalchemy import func
 
-from oddsapi.database.models import Fixture, League
-
-
-async def upsert_fixture(data: dict, session: AsyncSession):
+from oddsapi.database.models import Fixture
+from oddsapi.database.repository.bulk import upsert_rows, count_written
+from oddsapi.parser_import.normalize import clean_name, normalize_name
+
+# columns refreshed on every import. league_id is set only when the fixture is created
+FIXTURE_UPDATE_COLUMNS = (
+    "timezone",
+    "date",
+    "league_season",
+    "home_team_name",
+    "home_team_logo",
+    "home_team_source_id",
+    "away_team_name",
+    "away_team_logo",
+    "away_team_source_id",
+)
+
+
+def fixture_row(data: dict, league_id: int) -> dict:
+    """Fixture table row of a /fixtures response item"""
     fixture_data = data["fixture"]
-    league_data = data["league"]
     home_team = data["teams"]["home"]
     away_team = data["teams"]["away"]
 
-    stmt = select(Fixture).where(Fixture.source_id == fixture_data["id"])
-    fixture = (await session.scalars(stmt)).first()
-
-    update = True
-    if not fixture:
-        update = False
-        fixture = Fixture()
-        fixture.source_id = fixture_data["id"]
-
-    fixture.timezone = fixture_data["timezone"]
-    fixture.date = datetime.fromisoformat(fixture_data["date"])
-
-    fixture.league_season = league_data["season"]
-
-    fixture.home_team_name = home_team["name"]
-    fixture.home_team_logo = home_team["logo"]
-    fixture.home_team_source_id = home_team["id"]
+    return {
+        "source_id": fixture_data["id"],
+        "timezone": fixture_data["timezone"],
+        "date": datetime.fromisoformat(fixture_data["date"]),
+        "league_season": data["league"]["season"],
+        "league_id": league_id,
+        "home_team_name": clean_name(home_team["name"]),
+        "home_team_logo": home_team["logo"],
+        "home_team_source_id": home_team["id"],
+        "away_team_name": clean_name(away_team["name"]),
+        "away_team_logo": away_team["logo"],
+        "away_team_source_id": away_team["id"],
+    }
+
+
+async def upsert_fixtures(
+    fixtures_data: list[dict],
+    league_ids: dict[int, int],
+    session: AsyncSession,
+    copy: bool = False,
+) -> tuple[int, int]:
+    """Insert or update the fixtures of a /fixtures response.
+    league_ids maps league source ids to ids, fixtures of unknown leagues are skipped.
+    Unchanged fixtures are not written, so their updated_at stays the same.
+    Returns the number of inserted and updated fixtures"""
+    # a fixture can only be upserted once per statement, the last copy wins
+    rows = {}
+    skipped = 0
+    for data in fixtures_data:
+        league_id = league_ids.get(data["league"]["id"])
+        if league_id is None:
+            skipped += 1
+            continue
+
+        row = fixture_row(data, league_id)
+        rows[row["source_id"]] = row
+
+    if skipped:
+        logging.error(f"Skipped {skipped} fixtures of leagues that weren't imported")
+
+    written = await upsert_rows(
+        Fixture,
+        list(rows.values()),
+        ["source_id"],
+        session,
+        update_columns=FIXTURE_UPDATE_COLUMNS,
+        copy=copy,
+    )
 
-    fixture.away_team_name = away_team["name"]
-    fixture.away_team_logo = away_team["logo"]
-    fixture.away_team_source_id = away_team["id"]
+    return count_written(written)
 
-    # don't update existing relations
-    if not update:
-        league_stmt = select(League).where(League.source_id == league_data["id"])
-        league = (await session.scalars(league_stmt)).first()
 
-        if league:
-            fixture.league = league
-        else:
-            logging.error(
-                f"No league with id {league_data['id']} found for fixture {fixture.__dict__}"
-            )
-            return
+def upcoming_on_day(date: datetime):
+    """Filter of the fixtures on the same day as date that haven't started yet"""
+    # func.date is used to round datetime to date
+    return (
+        (Fixture.date > now())
+        & (Fixture.date >= func.date(date))
+        & (Fixture.date < (func.date(date) + text(r"interval '1 day'")))
+    )
 
-    session.add(fixture)
 
-    return update
+def best_match_stmt(home_team: str, away_team: str, date: datetime, condition):
+    """Best scoring fixture of the day that satisfies condition(home name, away name).
+    Names are compared unaccented, the trigram indexes cover f_unaccent(name)"""
+    home_team = normalize_name(home_team)
+    away_team = normalize_name(away_team)
+    home_name = func.f_unaccent(Fixture.home_team_name)
+    away_name = func.f_unaccent(Fixture.away_team_name)
 
+    score = func.similarity(home_name, home_team) + func.similarity(
+        away_name, away_team
+    )
 
-async def find_fixture_ilike(
-    home_team: str, away_team: str, date: datetime, session: AsyncSession
-) -> Fixture | None:
-    # func.date is used to round datetime to date
-    stmt = (
+    return (
         select(Fixture)
         .where(
-            func.unaccent(Fixture.home_team_name).ilike(f"%{home_team}%")
-            & func.unaccent(Fixture.away_team_name).ilike(f"%{away_team}%")
-            & (Fixture.date > now())
-            & (Fixture.date >= func.date(date))
-            & (Fixture.date < (func.date(date) + text(r"interval '1 day'")))
+            condition(home_name, home_team)
+            & condition(away_name, away_team)
+            & upcoming_on_day(date)
         )
-        .options(joinedload(Fixture.bets), joinedload(Fixture.notifications))
+        .order_by(score.desc(), Fixture.id)
+        .limit(1)
     )
 
-    fixture = (await session.scalars(stmt)).first()
-
-    return fixture  # noqa
-
 
-def _gen_soft_search_pattern(string: str) -> str:
-    """Convert text to sql query for search.
-    Adds | between words and discards words < 3 chars long"""
-
-    # remove words that are not useful for matching
-    ban_search_words = [
-        "FC",
-        "United",
-        "City",
-        "El",
-        "De",
-        "Los",
-        "The",
-        "SC",
-        "Club",
-        "Town",
-        "Al",
-        "Real",
-        "CF",
-        "CFR",
-        "FK",
-    ]
-    for word in ban_search_words:
-        string = string.replace(f"word ", "")
-        string = string.replace(f" word", "")
-
-    # remove any single letter words
-    string = re.sub(r"\b\w\b", "", string)
-
-    # remove whitespace
-    string = re.sub(r"\s+", " ", string.strip())
-    # dashes are sometimes used in place of spaces
-    string = string.replace("-", " ")
-
-    words = string.split(" ")
-
-    if len(words) < 2:
-        result = f".*{words[0]}.*"
-        return result
+def fixture_ilike_stmt(home_team: str, away_team: str, date: datetime):
+    return best_match_stmt(
+        home_team, away_team, date, lambda name, team: name.ilike(f"%{team}%")
+    )
 
-    words = [word for word in words if len(word) > 3]
 
-    result = "|".join(words)
+def fixture_similar_stmt(home_team: str, away_team: str, date: datetime):
+    # % is true if the similarity is above pg_trgm.similarity_threshold (0.3)
+    return best_match_stmt(
+        home_team, away_team, date, lambda name, team: name.op("%")(team)
+    )
 
-    return f".*({result}).*"
 
+async def find_fixture_ilike(
+    home_team: str, away_team: str, date: datetime, session: AsyncSession
+) -> Fixture | None:
+    """Fixture whose names contain the given ones"""
+    stmt = fixture_ilike_stmt(home_team, away_team, date)
+    fixture = (await session.scalars(stmt)).first()
 
-# .*one|two|three.*
+    return fixture  # noqa
 
 
-async def find_fixture_partial(
+async def find_fixture_similar(
     home_team: str, away_team: str, date: datetime, session: AsyncSession
-):
-    # func.date is used to round datetime to date
-    home_team = _gen_soft_search_pattern(home_team)
-    away_team = _gen_soft_search_pattern(away_team)
-    stmt = (
-        select(Fixture)
-        .where(
-            func.unaccent(Fixture.home_team_name).regexp_match(home_team, flags="i")
-            & func.unaccent(Fixture.away_team_name).regexp_match(away_team, flags="i")
-            & (Fixture.date > now())
-            & (Fixture.date >= func.date(date))
-            & (Fixture.date < (func.date(date) + text(r"interval '1 day'")))
-        )
-        .options(joinedload(Fixture.bets), joinedload(Fixture.notifications))
-    )
+) -> Fixture | None:
+    """Fixture with the most similar names"""
+    stmt = fixture_similar_stmt(home_team, away_team, date)
 
     # print raw sql in postgres dialect using literal binds compile
     # print(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
@@ -1,53 +1,51 @@
-import asyncio
 import datetime
+import logging
 
 from sqlalchemy import select, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import with_expression
 
-from oddsapi.database.repository.season import upsert_season
-from oddsapi.database.models import League, Season, Fixture, Bet
+from oddsapi.database.repository.bulk import upsert_rows, count_written
+from oddsapi.database.repository.season import replace_seasons
+from oddsapi.database.models import League, Fixture, Bet
 
 
-async def upsert_league(data: dict, session: AsyncSession):
+def league_row(data: dict) -> dict:
+    """League table row of a /leagues response item"""
     league_data = data["league"]
-    country_data = data["country"]
-    seasons_data = data["seasons"]
-
-    stmt = select(League).where(League.source_id == league_data["id"])
-    league = (await session.scalars(stmt)).first()
-
-    update = True
-    if not league:
-        update = False
-        league = League()
-        league.source_id = league_data["id"]
-
-    league.country = country_data["name"]
-    league.country_code = country_data["code"]
-    league.country_flag = country_data["flag"]
-    league.name = league_data["name"]
-    league.type = league_data["type"]
-    league.logo = league_data["logo"]
-
-    # return league
-    session.add(league)
-
-    # delete all seasons for this league
-    delete_seasons_stmt = (
-        delete(Season)
-        .where(Season.league_id == league.id)
-        .execution_options(synchronize_session="fetch")
+
+    return {
+        "source_id": league_data["id"],
+        "name": league_data["name"],
+        "type": league_data["type"],
+        "logo": league_data["logo"],
+        "country": data["country"]["name"],
+    }
+
+
+async def upsert_leagues(
+    leagues_data: list[dict], session: AsyncSession, copy: bool = False
+) -> tuple[int, int]:
+    """Insert or update the leagues of a /leagues response and replace their seasons.
+    Returns the number of inserted and updated leagues"""
+    written = await upsert_rows(
+        League,
+        [league_row(data) for data in leagues_data],
+        ["source_id"],
+        session,
+        copy=copy,
     )
-    await session.execute(delete_seasons_stmt)
 
-    update_season_coros = [
-        upsert_season(season, league, session) for season in seasons_data
-    ]
+    # unchanged leagues aren't returned by the upsert
+    league_ids = await get_league_ids(session)
+    seasons_data = {}
+    for data in leagues_data:
+        seasons_data[league_ids[data["league"]["id"]]] = data["seasons"]
 
-    await asyncio.gather(*update_season_coros)
+    inserted, updated = await replace_seasons(seasons_data, session, copy=copy)
+    logging.info(f"Imported seasons: {inserted} new, {updated} updated.")
 
-    return update
+    return count_written(written)
 
 
 async def delete_all_leagues(session: AsyncSession):
@@ -55,6 +53,12 @@ async def delete_all_leagues(session: AsyncSession):
     await session.execute(stmt)
 
 
+async def get_league_ids(session: AsyncSession) -> dict[int, int]:
+    """League ids by source id"""
+    stmt = select(League.source_id, League.id)
+    return dict((await session.execute(stmt)).all())
+
+
 async def get_league_count(session: AsyncSession) -> int:
     stmt = select(func.count(League.id))
     return (await session.scalars(stmt)).first()
@@ -1,32 +1,44 @@
 from datetime import datetime
 
-from sqlalchemy import select, and_
+from sqlalchemy import delete, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from oddsapi.database.models import League, Season
-
-
-async def upsert_season(season_data: dict, league: League, session: AsyncSession):
-    stmt = select(Season).where(
-        and_(Season.league_id == league.id, Season.year == season_data["year"])
-    )
-
-    season = (await session.scalars(stmt)).first()
-
-    update = True
-    if not season:
-        update = False
-        season = Season()
-        season.year = season_data["year"]
-        season.league = league
-
-    season.start = datetime.strptime(season_data["start"], "%Y-%m-%d")
-    season.end = datetime.strptime(season_data["end"], "%Y-%m-%d")
-    season.current = season_data["current"]
-
-    if season_data.get("coverage"):
-        season.odds_coverage = season_data["coverage"]["odds"]
-
-    session.add(season)
-
-    return update
+from oddsapi.database.models import Season
+from oddsapi.database.repository.bulk import upsert_rows, count_written
+
+
+def season_row(season_data: dict, league_id: int) -> dict:
+    """Season table row of a season of a /leagues response item"""
+    coverage = season_data.get("coverage") or {}
+
+    return {
+        "league_id": league_id,
+        "year": season_data["year"],
+        "start": datetime.strptime(season_data["start"], "%Y-%m-%d"),
+        "end": datetime.strptime(season_data["end"], "%Y-%m-%d"),
+        "current": season_data["current"],
+        "odds_coverage": coverage.get("odds", False),
+    }
+
+
+async def replace_seasons(
+    seasons_data: dict[int, list[dict]], session: AsyncSession, copy: bool = False
+) -> tuple[int, int]:
+    """Make the seasons of the given leagues (league id -> /leagues seasons) match the response.
+    Seasons missing from the response are deleted.
+    Returns the number of inserted and updated seasons"""
+    rows = [
+        season_row(season_data, league_id)
+        for league_id, seasons in seasons_data.items()
+        for season_data in seasons
+    ]
+
+    written = await upsert_rows(Season, rows, ["league_id", "year"], session, copy=copy)
+
+    keep = [(row["league_id"], row["year"]) for row in rows]
+    stmt = delete(Season).where(Season.league_id.in_(list(seasons_data)))
+    if keep:
+        stmt = stmt.where(tuple_(Season.league_id, Season.year).not_in(keep))
+    await session.execute(stmt.execution_options(synchronize_session=False))
+
+    return count_written(written)
@@ -1,32 +1,37 @@
-from sqlalchemy import select, delete
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from oddsapi.database.models import Team
-
-
-async def upsert_team(team_data: dict, country_id: int, session: AsyncSession):
-    team_data = team_data["team"]
-
-    stmt = select(Team).where(Team.source_id == team_data["id"])
-    team = (await session.scalars(stmt)).first()
-
-    update = True
-    if not team:
-        update = False
-        team = Team()
-        team.source_id = team_data["id"]
-
-    team.name = team_data["name"]
-    team.code = team_data["code"]
-    team.logo = team_data["logo"]
-    team.founded_at = team_data["founded"]
-    team.national = team_data["national"]
-
-    team.country_id = country_id
-
-    session.add(team)
-
-    return update
+from oddsapi.database.repository.bulk import upsert_rows, count_written
+
+
+def team_row(data: dict, country_id: int) -> dict:
+    """Team table row of a /teams response item"""
+    team_data = data["team"]
+
+    return {
+        "source_id": team_data["id"],
+        "name": team_data["name"],
+        "code": team_data["code"],
+        "logo": team_data["logo"],
+        "founded_at": team_data["founded"],
+        "national": team_data["national"],
+        "country_id": country_id,
+    }
+
+
+async def upsert_teams(
+    teams_data: dict[int, list[dict]], session: AsyncSession, copy: bool = False
+) -> tuple[int, int]:
+    """Insert or update the teams of /teams responses by country id.
+    Returns the number of inserted and updated teams"""
+    rows = [
+        team_row(data, country_id)
+        for country_id, teams in teams_data.items()
+        for data in teams
+    ]
+    written = await upsert_rows(Team, rows, ["source_id"], session, copy=copy)
+    return count_written(written)
 
 
 async def delete_all_teams(session: AsyncSession):
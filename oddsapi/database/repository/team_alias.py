@@ -0,0 +1,47 @@
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from oddsapi.database.models import TeamAlias
+
+
+async def get_team_aliases(session: AsyncSession) -> list:
+    """All aliases as (bookmaker, name, team_source_id) rows"""
+    stmt = select(TeamAlias.bookmaker, TeamAlias.name, TeamAlias.team_source_id)
+    return (await session.execute(stmt)).all()  # noqa
+
+
+async def upsert_team_aliases(aliases: list[dict], session: AsyncSession):
+    """Insert aliases or point existing ones to another team.
+    Values are dicts with bookmaker, name and team_source_id keys"""
+    # rows are locked in the same order by every consumer
+    aliases = sorted(aliases, key=lambda alias: (alias["bookmaker"], alias["name"]))
+
+    stmt = insert(TeamAlias).values(aliases)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_team_alias_bookmaker_name",
+        set_={
+            "team_source_id": stmt.excluded.team_source_id,
+            "updated_at": func.now(),
+        },
+    )
+
+    await session.execute(stmt)
+
+
+async def delete_team_aliases(
+    bookmaker: str,
+    session: AsyncSession,
+    name: str | None = None,
+    team_source_id: int | None = None,
+) -> int:
+    """Delete the aliases of a bookmaker, only the ones of the given normalized name
+    and/or team if set. Returns the number of deleted aliases"""
+    stmt = delete(TeamAlias).where(TeamAlias.bookmaker == bookmaker)
+    if name is not None:
+        stmt = stmt.where(TeamAlias.name == name)
+    if team_source_id is not None:
+        stmt = stmt.where(TeamAlias.team_source_id == team_source_id)
+
+    result = await session.execute(stmt)
+    return result.rowcount
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import math
+
+from oddsapi.settings import (
+    LISTENER_BATCH_MIN_SIZE,
+    LISTENER_BATCH_SIZE,
+    LISTENER_BATCH_MIN_WAIT,
+    LISTENER_BATCH_MAX_WAIT,
+    LISTENER_LATENCY_SLO,
+)
+
+
+def clamp(value, low, high):
+    return max(low, min(value, high))
+
+
+class AdaptiveBatching:
+    """Adapts the batch size and the wait time of a transport to the queue lag.
+    An event waits for the backlog ahead of it, for its batch to fill up
+    and for the batch to be written, all of that should fit in latency_slo.
+    Without a backlog batches are small and the rest of the slo is spent waiting
+    for them to fill up. A backlog is drained in batches as large as can be written
+    in half of the slo, since larger batches amortize the cost of a commit"""
+
+    # time in seconds between two checks of the queue lag
+    interval = 1
+    # weight of the newest batch in the average write time per event
+    smoothing = 0.2
+
+    def __init__(
+        self,
+        consumers: int,
+        min_size: int = LISTENER_BATCH_MIN_SIZE,
+        max_size: int = LISTENER_BATCH_SIZE,
+        min_wait: float = LISTENER_BATCH_MIN_WAIT,
+        max_wait: float = LISTENER_BATCH_MAX_WAIT,
+        latency_slo: float = LISTENER_LATENCY_SLO,
+    ):
+        self.consumers = consumers
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
+        self.min_wait = min_wait
+        self.max_wait = max(max_wait, min_wait)
+        self.latency_slo = latency_slo
+
+        self.batch_size = self.min_size
+        self.wait = self.max_wait
+        self.lag = 0
+        # average time in seconds to process and commit one event of a batch
+        self.event_time: float | None = None
+        self.slo_missed = False
+
+    def observe(self, events: int, seconds: float):
+        """Record the time it took to write a batch"""
+        if not events:
+            return
+
+        event_time = seconds / events
+        if self.event_time is None:
+            self.event_time = event_time
+        else:
+            self.event_time += self.smoothing * (event_time - self.event_time)
+
+    def adjust(self, lag: int):
+        self.lag = lag
+        event_time = self.event_time or 0
+
+        # largest batch that can be written in half of the slo
+        if event_time:
+            slo_size = int(self.latency_slo / 2 / event_time)
+        else:
+            slo_size = self.max_size
+        max_size = clamp(slo_size, self.min_size, self.max_size)
+
+        # the backlog is split between the consumers
+        self.batch_size = clamp(
+            math.ceil(lag / self.consumers), self.min_size, max_size
+        )
+
+        if lag:
+            # batches fill up right away, don't wait for stragglers
+            self.wait = self.min_wait
+        else:
+            self.wait = clamp(
+                self.latency_slo / 2 - self.batch_size * event_time,
+                self.min_wait,
+                self.max_wait,
+            )
+
+    def estimated_latency(self) -> float:
+        """Seconds from an event entering redis to its commit at the current lag"""
+        event_time = self.event_time or 0
+        backlog = self.lag * event_time / self.consumers
+        return backlog + self.wait + self.batch_size * event_time
+
+    def summary(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "wait": round(self.wait, 3),
+            "lag": self.lag,
+            "latency": round(self.estimated_latency(), 3),
+        }
+
+    async def run(self, transport):
+        """Check the lag of the transport queues and resize its batches"""
+        while True:
+            self.adjust(await transport.lag())
+            transport.batch_size = self.batch_size
+            transport.max_wait = self.wait
+
+            # log once when the slo is missed and once when it's met again
+            missed = self.estimated_latency() > self.latency_slo
+            if missed != self.slo_missed:
+                self.slo_missed = missed
+                logging.warning(
+                    f"Latency slo of {self.latency_slo}s "
+                    f"{'missed' if missed else 'met again'}: {self.summary()}"
+                )
+
+            await asyncio.sleep(self.interval)
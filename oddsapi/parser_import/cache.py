@@ -0,0 +1,185 @@
+import datetime
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from redis.asyncio import Redis
+
+from oddsapi.settings import FIXTURE_PARSE_DAYS
+
+
+class LRUCache:
+    """Bounded in-process cache that evicts the least recently used key"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default=None):
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+
+        return self._data[key]
+
+    def set(self, key: Hashable, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+
+class TTLCache:
+    """Bounded in-process cache whose entries expire ttl seconds after they were set"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._data = LRUCache(maxsize)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._data.pop(key)
+            return default
+
+        return value
+
+    def set(self, key: Hashable, value):
+        self._data.set(key, (time.monotonic() + self.ttl, value))
+
+    def clear(self):
+        self._data.clear()
+
+
+class EventUrlCache:
+    """Maps (bookmaker, event_url) to the matched fixture id and kickoff date.
+    In-process LRU in front of redis, so the mapping survives listener restarts"""
+
+    key_prefix = "event_url"
+
+    # matched fixtures are never further away than the imported fixture range
+    ttl = datetime.timedelta(days=FIXTURE_PARSE_DAYS)
+
+    def __init__(self, redis: Redis, maxsize: int = 20000):
+        self.redis = redis
+        self._local = LRUCache(maxsize)
+
+    def _redis_key(self, bookmaker: str, event_url: str) -> str:
+        return f"{self.key_prefix}:{bookmaker}:{event_url}"
+
+    async def get(
+        self, bookmaker: str, event_url: str
+    ) -> tuple[int, datetime.datetime] | None:
+        key = (bookmaker, event_url)
+        value = self._local.get(key)
+        if value:
+            return value
+
+        data = await self.redis.get(self._redis_key(bookmaker, event_url))
+        if not data:
+            return None
+
+        fixture_id, timestamp = data.split()
+        value = (
+            int(fixture_id),
+            datetime.datetime.fromtimestamp(float(timestamp), datetime.timezone.utc),
+        )
+        self._local.set(key, value)
+
+        return value
+
+    async def set(
+        self,
+        bookmaker: str,
+        event_url: str,
+        fixture_id: int,
+        fixture_date: datetime.datetime,
+    ):
+        self._local.set((bookmaker, event_url), (fixture_id, fixture_date))
+        await self.redis.set(
+            self._redis_key(bookmaker, event_url),
+            f"{fixture_id} {fixture_date.timestamp()}",
+            ex=self.ttl,
+        )
+
+    async def delete(self, bookmaker: str, event_url: str):
+        self._local.pop((bookmaker, event_url))
+        await self.redis.delete(self._redis_key(bookmaker, event_url))
+
+
+def odds_digest(odds: dict) -> str:
+    """Stable hash of the odds written for a bet"""
+    data = json.dumps(odds, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+class OddsHashCache:
+    """Digest of the odds last written per (bookmaker, fixture id).
+    Kept in redis only, so replicas consuming the same queue compare against
+    the digest written by whichever of them wrote the fixture last"""
+
+    key_prefix = "odds_hash"
+
+    ttl = datetime.timedelta(days=FIXTURE_PARSE_DAYS)
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    def _redis_key(self, bookmaker: str, fixture_id: int) -> str:
+        return f"{self.key_prefix}:{bookmaker}:{fixture_id}"
+
+    async def get(self, bookmaker: str, fixture_id: int) -> str | None:
+        data = await self.redis.get(self._redis_key(bookmaker, fixture_id))
+        if not data:
+            return None
+
+        return data.decode()
+
+    async def set_many(self, bookmaker: str, digests: dict[int, str]):
+        if not digests:
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for fixture_id, digest in digests.items():
+                pipe.set(self._redis_key(bookmaker, fixture_id), digest, ex=self.ttl)
+
+            await pipe.execute()
+
+
+async def clear_match_caches(redis: Redis, chunk_size: int = 1000) -> int:
+    """Delete the cached matches and odds digests of every bookmaker.
+    Both point to fixture ids, so they are stale once fixtures are deleted or merged.
+    Returns the number of deleted keys"""
+    deleted = 0
+    for prefix in (EventUrlCache.key_prefix, OddsHashCache.key_prefix):
+        keys = []
+        async for key in redis.scan_iter(f"{prefix}:*", count=chunk_size):
+            keys.append(key)
+            if len(keys) >= chunk_size:
+                deleted += await redis.delete(*keys)
+                keys = []
+
+        if keys:
+            deleted += await redis.delete(*keys)
+
+    return deleted
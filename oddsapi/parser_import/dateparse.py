@@ -0,0 +1,30 @@
+import datetime
+from functools import lru_cache
+
+import dateparser
+
+
+def parse_iso(raw: str) -> datetime.datetime | None:
+    """Parse an ISO 8601 date, the only format that is read the same by dateparser
+    whatever the parser. None for anything else"""
+    try:
+        return datetime.datetime.fromisoformat(raw)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _dateparser_parse(raw: str, today: datetime.date) -> datetime.datetime | None:
+    # today is a part of the cache key: relative dates ("today 18:00")
+    # and dates without a year resolve differently on the next day
+    return dateparser.parse(raw)
+
+
+def parse_event_datetime(raw: str) -> datetime.datetime | None:
+    """Parse an event date. Anything but ISO 8601 goes through dateparser,
+    memoized by the raw string"""
+    date = parse_iso(raw)
+    if date:
+        return date
+
+    return _dateparser_parse(raw, datetime.date.today())
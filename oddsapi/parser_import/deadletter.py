@@ -0,0 +1,160 @@
+import datetime
+import logging
+import time
+
+import msgspec
+from redis.asyncio import Redis
+
+from oddsapi.database.init import SessionLocal
+from oddsapi.parser_import.cache import EventUrlCache
+from oddsapi.parser_import.fixture_index import FixtureIndex
+from oddsapi.parser_import.transport import push_events
+from oddsapi.parser_import.wire import encode_requeued
+from oddsapi.settings import DEADLETTER_MAX_SIZE, LISTENER_QUEUES
+
+
+class DeadLetter(msgspec.Struct):
+    # kickoff date parsed by the listener, None if it wasn't parsed yet
+    date: datetime.datetime | None
+    # the decoded event, encoded as json again
+    event: msgspec.Raw
+    # time the event was received by the listener, kept when it's requeued.
+    # None for dead letters stored before it was recorded
+    received_at: float | None = None
+
+
+class DeadLetterStore:
+    """Unmatched events per bookmaker, deduplicated by event_url.
+    Kept so they can be matched again after new fixtures are imported.
+    Bounded to max_size events per bookmaker, the oldest ones are dropped"""
+
+    key_prefix = "deadletter"
+
+    def __init__(self, redis: Redis, max_size: int = DEADLETTER_MAX_SIZE):
+        self.redis = redis
+        self.max_size = max_size
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder(DeadLetter)
+
+    def _events_key(self, bookmaker: str) -> str:
+        return f"{self.key_prefix}:{bookmaker}"
+
+    def _added_key(self, bookmaker: str) -> str:
+        # event_urls scored by the time they were added, used for trimming
+        return f"{self.key_prefix}:{bookmaker}:added"
+
+    async def add_many(self, bookmaker: str, events: dict[str, tuple]):
+        """Store events keyed by event_url. Values are (event, kickoff date, received_at)"""
+        if not events:
+            return
+
+        letters = {
+            event_url: self._encoder.encode(
+                DeadLetter(date, msgspec.Raw(self._encoder.encode(event)), received_at)
+            )
+            for event_url, (event, date, received_at) in events.items()
+        }
+        added_at = time.time()
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(self._events_key(bookmaker), mapping=letters)
+            pipe.zadd(
+                self._added_key(bookmaker),
+                {event_url: added_at for event_url in letters},
+            )
+            pipe.zcard(self._added_key(bookmaker))
+            *_, size = await pipe.execute()
+
+        if size > self.max_size:
+            dropped = await self.redis.zpopmin(
+                self._added_key(bookmaker), size - self.max_size
+            )
+            await self.redis.hdel(
+                self._events_key(bookmaker), *(event_url for event_url, _ in dropped)
+            )
+
+    async def get_all(self, bookmaker: str) -> dict[str, DeadLetter]:
+        data = await self.redis.hgetall(self._events_key(bookmaker))
+        return {
+            event_url.decode(): self._decoder.decode(letter)
+            for event_url, letter in data.items()
+        }
+
+    async def remove_many(self, bookmaker: str, event_urls: list[str]):
+        if not event_urls:
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hdel(self._events_key(bookmaker), *event_urls)
+            pipe.zrem(self._added_key(bookmaker), *event_urls)
+            await pipe.execute()
+
+
+class FailedEventStore(DeadLetterStore):
+    """Events that couldn't be written even on their own, e.g. because of a db error.
+    Kept for inspection, they are not matched again"""
+
+    key_prefix = "failed"
+
+
+async def rematch_dead_letters(redis: Redis, since: datetime.datetime) -> int:
+    """Match the dead letters of every parser queue against the fixtures imported
+    or changed since the given time. Matched events are pushed back to their queue
+    with the match cached, so the listener doesn't have to match them again.
+    They keep the time they were first received, so they don't overwrite newer odds.
+    Dead letters of started fixtures and of events matched in the meantime are dropped.
+    Returns the number of requeued events"""
+    index = FixtureIndex()
+    # only fixtures updated after the watermark are loaded
+    index.updated_at = since
+    async with SessionLocal() as session:
+        imported = await index.refresh(session)
+
+    if not imported:
+        return 0
+
+    store = DeadLetterStore(redis)
+    event_urls = EventUrlCache(redis)
+    time_now = datetime.datetime.now(datetime.timezone.utc)
+
+    requeued = 0
+    for queue in LISTENER_QUEUES:
+        letters = await store.get_all(queue)
+
+        matched = []
+        expired = []
+        for event_url, letter in letters.items():
+            if letter.date.astimezone() <= time_now:
+                expired.append(event_url)
+                continue
+
+            event = msgspec.json.decode(letter.event)
+            fixture = index.match(
+                event["home_team_name"], event["away_team_name"], letter.date
+            )
+            if not fixture:
+                continue
+
+            # the listener matched a newer copy of the event in the meantime
+            if await event_urls.get(queue, event_url):
+                expired.append(event_url)
+                continue
+
+            await event_urls.set(queue, event_url, fixture.id, fixture.date)
+            payload = bytes(letter.event)
+            if letter.received_at:
+                payload = encode_requeued(payload, letter.received_at)
+            matched.append((event_url, payload))
+
+        await push_events(redis, queue, [payload for _, payload in matched])
+        await store.remove_many(
+            queue, [event_url for event_url, _ in matched] + expired
+        )
+
+        logging.info(
+            f"Requeued {len(matched)} of {len(letters)} dead letters of {queue}, "
+            f"dropped {len(expired)} started or already matched"
+        )
+        requeued += len(matched)
+
+    return requeued
@@ -0,0 +1,329 @@
+import datetime
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.functions import now
+
+from oddsapi.database.init import SessionLocal
+from oddsapi.database.models import Fixture
+from oddsapi.database.redis_connection import FIXTURE_UPDATES_CHANNEL
+from oddsapi.parser_import.normalize import normalize_name, name_tokens
+
+# fixtures updated during an incremental refresh can be committed with an updated_at
+# that is a little older than the previous refresh, so refreshes overlap by this much
+REFRESH_OVERLAP = datetime.timedelta(minutes=5)
+
+# a fixture matched by shared words needs at least this similarity of the team names
+TOKEN_MATCH_MIN_SCORE = 0.5
+# and has to beat the next best fixture by this much, ambiguous events are left to the db search
+TOKEN_MATCH_MARGIN = 0.2
+
+
+def match_day(date: datetime.datetime) -> datetime.date:
+    """Calendar day the fixture is matched on. Aware datetimes are converted to local time"""
+    if date.tzinfo:
+        date = date.astimezone()
+
+    return date.date()
+
+
+def jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+
+    return len(a & b) / len(a | b)
+
+
+@dataclass(slots=True)
+class IndexedFixture:
+    id: int
+    date: datetime.datetime
+    day: datetime.date
+    home_team_name: str
+    away_team_name: str
+    home_tokens: frozenset[str]
+    away_tokens: frozenset[str]
+    home_team_source_id: int
+    away_team_source_id: int
+
+
+class FixtureIndex:
+    """In-memory index of upcoming fixtures used to match parser events without
+    scanning the fixture table. Names are stored normalized, so matching is a
+    dict/set lookup keyed by the kickoff day and team names."""
+
+    def __init__(self):
+        self._fixtures: dict[int, IndexedFixture] = {}
+        self._by_day: dict[datetime.date, set[int]] = defaultdict(set)
+        self._by_names: dict[tuple[datetime.date, str, str], int] = {}
+        self._by_teams: dict[tuple[datetime.date, int, int], int] = {}
+        self._home_tokens: dict[tuple[datetime.date, str], set[int]] = defaultdict(set)
+        self._away_tokens: dict[tuple[datetime.date, str], set[int]] = defaultdict(set)
+
+        # max updated_at of the fixtures seen so far. None until the first refresh
+        self.updated_at: datetime.datetime | None = None
+        # incremented every time new fixtures are imported.
+        # results of failed matches are only valid within the same generation
+        self.generation = 0
+
+    def __len__(self):
+        return len(self._fixtures)
+
+    def get(self, fixture_id: int) -> IndexedFixture | None:
+        return self._fixtures.get(fixture_id)
+
+    async def refresh(self, session: AsyncSession):
+        """Load upcoming fixtures that changed since the previous refresh
+        and drop the ones that were deleted"""
+        stmt = select(
+            Fixture.id,
+            Fixture.date,
+            Fixture.home_team_name,
+            Fixture.away_team_name,
+            Fixture.home_team_source_id,
+            Fixture.away_team_source_id,
+            Fixture.updated_at,
+        ).where(Fixture.date > now())
+
+        if self.updated_at:
+            stmt = stmt.where(Fixture.updated_at > self.updated_at - REFRESH_OVERLAP)
+
+        rows = (await session.execute(stmt)).all()
+        for row in rows:
+            self.add(
+                row.id,
+                row.date,
+                row.home_team_name,
+                row.away_team_name,
+                row.home_team_source_id,
+                row.away_team_source_id,
+            )
+
+            if not self.updated_at or row.updated_at > self.updated_at:
+                self.updated_at = row.updated_at
+
+        # deleted fixtures don't show up as changed, only their absence tells
+        stmt = select(Fixture.id).where(Fixture.date > now())
+        upcoming = set((await session.scalars(stmt)).all())
+        for fixture_id in self._fixtures.keys() - upcoming:
+            self.remove(fixture_id)
+
+        self.evict_started()
+
+        return len(rows)
+
+    async def watch(self, redis: Redis, interval: float):
+        """Refresh the index every interval seconds or as soon as new fixtures are imported"""
+        pubsub = redis.pubsub()
+        await pubsub.subscribe(FIXTURE_UPDATES_CHANNEL)
+
+        while True:
+            async with SessionLocal() as session:
+                refreshed = await self.refresh(session)
+
+            logging.debug(f"Refreshed {refreshed} fixtures in the fixture index")
+
+            # returns on the change signal or after the timeout
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=interval
+            )
+            if message:
+                self.generation += 1
+
+    def add(
+        self,
+        fixture_id: int,
+        date: datetime.datetime,
+        home_team_name: str,
+        away_team_name: str,
+        home_team_source_id: int,
+        away_team_source_id: int,
+    ) -> IndexedFixture:
+        # the fixture could have been rescheduled or renamed since it was indexed
+        self.remove(fixture_id)
+
+        fixture = IndexedFixture(
+            id=fixture_id,
+            date=date,
+            day=match_day(date),
+            home_team_name=normalize_name(home_team_name),
+            away_team_name=normalize_name(away_team_name),
+            home_tokens=name_tokens(home_team_name),
+            away_tokens=name_tokens(away_team_name),
+            home_team_source_id=home_team_source_id,
+            away_team_source_id=away_team_source_id,
+        )
+
+        self._fixtures[fixture_id] = fixture
+        self._by_day[fixture.day].add(fixture_id)
+        names = (fixture.day, fixture.home_team_name, fixture.away_team_name)
+        self._by_names[names] = fixture_id
+        teams = (fixture.day, home_team_source_id, away_team_source_id)
+        self._by_teams[teams] = fixture_id
+        for token in fixture.home_tokens:
+            self._home_tokens[(fixture.day, token)].add(fixture_id)
+        for token in fixture.away_tokens:
+            self._away_tokens[(fixture.day, token)].add(fixture_id)
+
+        return fixture
+
+    def remove(self, fixture_id: int):
+        fixture = self._fixtures.pop(fixture_id, None)
+        if not fixture:
+            return
+
+        self._by_day[fixture.day].discard(fixture_id)
+        if not self._by_day[fixture.day]:
+            del self._by_day[fixture.day]
+
+        names = (fixture.day, fixture.home_team_name, fixture.away_team_name)
+        if self._by_names.get(names) == fixture_id:
+            del self._by_names[names]
+
+        teams = (fixture.day, fixture.home_team_source_id, fixture.away_team_source_id)
+        if self._by_teams.get(teams) == fixture_id:
+            del self._by_teams[teams]
+
+        for tokens, token_map in (
+            (fixture.home_tokens, self._home_tokens),
+            (fixture.away_tokens, self._away_tokens),
+        ):
+            for token in tokens:
+                token_map[(fixture.day, token)].discard(fixture_id)
+                if not token_map[(fixture.day, token)]:
+                    del token_map[(fixture.day, token)]
+
+    def evict_started(self):
+        """Remove fixtures that have already started"""
+        time_now = datetime.datetime.now(datetime.timezone.utc)
+        started = [
+            fixture.id
+            for fixture in self._fixtures.values()
+            if fixture.date <= time_now
+        ]
+        for fixture_id in started:
+            self.remove(fixture_id)
+
+    def match(
+        self, home_team: str, away_team: str, date: datetime.datetime
+    ) -> IndexedFixture | None:
+        """Find an upcoming fixture on the same day as date"""
+        matched = self.match_with_score(home_team, away_team, date)
+        return matched[0] if matched else None
+
+    def match_with_score(
+        self, home_team: str, away_team: str, date: datetime.datetime
+    ) -> tuple[IndexedFixture, float] | None:
+        """Find an upcoming fixture on the same day as date and the similarity of its names.
+        Tries an exact name match, then substring (same as find_fixture_ilike),
+        then the fixture with the most similar significant words. A fixture found by words
+        needs TOKEN_MATCH_MIN_SCORE and a TOKEN_MATCH_MARGIN lead over the next best one
+        """
+        day = match_day(date)
+        home_tokens = name_tokens(home_team)
+        away_tokens = name_tokens(away_team)
+        home_team = normalize_name(home_team)
+        away_team = normalize_name(away_team)
+
+        fixture_id = self._by_names.get((day, home_team, away_team))
+        if fixture_id and self._is_upcoming(fixture_id):
+            return self._fixtures[fixture_id], 1.0
+
+        substring_ids = [
+            fixture_id
+            for fixture_id in self._by_day.get(day, ())
+            if home_team in self._fixtures[fixture_id].home_team_name
+            and away_team in self._fixtures[fixture_id].away_team_name
+            and self._is_upcoming(fixture_id)
+        ]
+        if len(substring_ids) == 1:
+            fixture = self._fixtures[substring_ids[0]]
+            return fixture, self._token_score(home_tokens, away_tokens, fixture)
+        if substring_ids:
+            return self._best_scored(substring_ids, home_tokens, away_tokens)
+
+        home_candidates = set()
+        for token in home_tokens:
+            home_candidates |= self._home_tokens.get((day, token), set())
+
+        away_candidates = set()
+        for token in away_tokens:
+            away_candidates |= self._away_tokens.get((day, token), set())
+
+        return self._best_scored(
+            [
+                fixture_id
+                for fixture_id in home_candidates & away_candidates
+                if self._is_upcoming(fixture_id)
+            ],
+            home_tokens,
+            away_tokens,
+        )
+
+    def _best_scored(
+        self,
+        fixture_ids: list[int],
+        home_tokens: frozenset[str],
+        away_tokens: frozenset[str],
+    ) -> tuple[IndexedFixture, float] | None:
+        """The candidate with the most similar names, if it is similar enough
+        and clearly ahead of the next best one"""
+        scored = sorted(
+            (
+                (
+                    self._token_score(
+                        home_tokens, away_tokens, self._fixtures[fixture_id]
+                    ),
+                    fixture_id,
+                )
+                for fixture_id in fixture_ids
+            ),
+            reverse=True,
+        )
+        if not scored:
+            return None
+
+        score, fixture_id = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        if score < TOKEN_MATCH_MIN_SCORE or score - runner_up < TOKEN_MATCH_MARGIN:
+            logging.debug(
+                f"No clear fixture among {len(scored)} candidates: "
+                f"best score {score:.2f}, next {runner_up:.2f}"
+            )
+            return None
+
+        return self._fixtures[fixture_id], score
+
+    def match_teams(
+        self,
+        home_team_source_id: int,
+        away_team_source_id: int,
+        date: datetime.datetime,
+    ) -> IndexedFixture | None:
+        """Find an upcoming fixture of the two teams on the same day as date"""
+        fixture_id = self._by_teams.get(
+            (match_day(date), home_team_source_id, away_team_source_id)
+        )
+        if fixture_id and self._is_upcoming(fixture_id):
+            return self._fixtures[fixture_id]
+
+        return None
+
+    @staticmethod
+    def _token_score(
+        home_tokens: frozenset[str],
+        away_tokens: frozenset[str],
+        fixture: IndexedFixture,
+    ) -> float:
+        return (
+            jaccard(home_tokens, fixture.home_tokens)
+            + jaccard(away_tokens, fixture.away_tokens)
+        ) / 2
+
+    def _is_upcoming(self, fixture_id: int) -> bool:
+        date = self._fixtures[fixture_id].date
+        return date > datetime.datetime.now(datetime.timezone.utc)
@@ -1,12 +1,17 @@
 import asyncio
-import json
+import copy
+import datetime
 import logging
+import time
+import weakref
 from abc import abstractmethod, ABC
-from dataclasses import asdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from enum import IntEnum
-from typing import Type, TypeVar
+from typing import Type, TypeVar, Iterable
 
-import dateparser
+import msgspec
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from oddsapi.database.data_models import (
@@ -14,22 +19,50 @@ from oddsapi.database.data_models import (
     FonbetEvent,
     MarathonEvent,
     PinnacleEvent,
-    CommonEvent,
+    ParserEvent,
 )
-from oddsapi.database.init import SessionLocal
-from oddsapi.database.models import Bet
+from oddsapi.database.init import SessionLocal, pool_stats
 from oddsapi.database.redis_connection import redis_connect, RedisDB
 from oddsapi.database.repository.bet import (
-    upsert_bet,
+    upsert_bets,
+    find_bet_fixture,
+    get_bet_odds,
+)
+from oddsapi.database.repository.fixture import (
+    find_fixture_ilike,
+    find_fixture_similar,
 )
-from oddsapi.database.repository.fixture import find_fixture_ilike, find_fixture_partial
 from oddsapi.helpers import configure_logging
-from oddsapi.parser_import.convert import (
-    convert_object_key_totals,
-    convert_object_key_first_half_totals,
+from oddsapi.parser_import.dateparse import parse_event_datetime
+from oddsapi.parser_import.cache import (
+    EventUrlCache,
+    TTLCache,
+    OddsHashCache,
+    odds_digest,
+)
+from oddsapi.parser_import.transport import make_transport, EventBatch
+from oddsapi.parser_import.batching import AdaptiveBatching
+from oddsapi.parser_import.timing import StageTimer
+from oddsapi.parser_import.wire import EventDecoder, split_requeued
+from oddsapi.parser_import.deadletter import DeadLetterStore, FailedEventStore
+from oddsapi.parser_import.fixture_index import (
+    FixtureIndex,
+    IndexedFixture,
+    match_day,
+)
+from oddsapi.parser_import.normalize import normalize_name
+from oddsapi.parser_import.team_alias import TeamAliases
+from oddsapi.settings import (
+    LISTENER_BATCH_SIZE,
+    LISTENER_BATCH_MAX_WAIT,
+    LISTENER_CONSUMERS,
+    LISTENER_COALESCE,
+    LISTENER_PIPELINE,
+    LISTENER_PIPELINE_DEPTH,
+    LISTENER_ADAPTIVE_BATCHING,
 )
 
-T = TypeVar("T", bound=BetcityEvent | FonbetEvent | MarathonEvent | PinnacleEvent)
+T = TypeVar("T", bound=ParserEvent)
 
 
 class ProcessStatus(IntEnum):
@@ -37,16 +70,63 @@ class ProcessStatus(IntEnum):
     Updated = 1
     NotFoundError = 2
     DateParseError = 3
+    Unchanged = 4
+    # a newer event of the fixture was already written
+    Stale = 5
+
+
+@dataclass(slots=True)
+class EventResult:
+    # None until the bet of the event is written
+    status: ProcessStatus | None
+    fixture_id: int | None = None
+    # digest of the written odds. Stored only after the batch is committed
+    odds_digest: str | None = None
+    # Bet column values to upsert
+    bet: dict | None = None
+    # unmatched event, its kickoff date and the time it was received,
+    # kept in the dead letter store
+    unmatched: tuple | None = None
 
 
 class ParserListener(ABC):
     stats = {
         "total_events": 0,
+        "batches": 0,
         "added": 0,
         "updated": 0,
+        "unchanged": 0,
+        # bets not written because a newer event of the fixture was written first
+        "stale": 0,
+        # older copies of an event_url that were dropped in favor of a newer one
+        "coalesced": 0,
+        "event_url_cache": {
+            "hits": 0,
+            "misses": 0,
+            # cached fixtures that don't exist anymore
+            "stale": 0,
+        },
+        "fixture_index": {
+            "size": 0,
+            "hits": 0,
+            "misses": 0,
+        },
+        "negative_cache": {
+            "size": 0,
+            "hits": 0,
+            "misses": 0,
+        },
+        "team_aliases": {
+            "size": 0,
+            "hits": 0,
+            "learned": 0,
+        },
         "errors": {
             "not_found": 0,
             "dateparse_error": 0,
+            "malformed": 0,
+            # events that failed to be written even on their own
+            "failed": 0,
         },
     }
 
@@ -54,11 +134,99 @@ class ParserListener(ABC):
 
     stats_interval = 30
 
-    def __init__(self, debug: bool = False):
+    # max time in seconds between fixture index refreshes
+    fixture_index_interval = 60
+    # time in seconds between reloads of the team aliases
+    team_aliases_interval = 10 * 60
+
+    # time in seconds an unmatched event is not matched again.
+    # cleared earlier when new fixtures are imported
+    negative_cache_ttl = 30 * 60
+    negative_cache_size = 20000
+
+    # max number of events committed in one transaction. 1 disables batching
+    batch_size = LISTENER_BATCH_SIZE
+    # max time in seconds to wait for a batch to fill up once its first event arrived
+    batch_max_wait = LISTENER_BATCH_MAX_WAIT
+
+    # number of concurrent consumer tasks, each with a db session of its own
+    consumers = LISTENER_CONSUMERS
+
+    # keep only the newest event per event_url of a batch
+    coalesce = LISTENER_COALESCE
+
+    # pop, decode and parse dates of the next batches while the current ones are written
+    pipelined = LISTENER_PIPELINE
+    # max number of batches waiting between the pipeline stages
+    pipeline_depth = LISTENER_PIPELINE_DEPTH
+
+    # batch size and wait time follow the queue lag, the ones above are the max values
+    adaptive_batching = LISTENER_ADAPTIVE_BATCHING
+
+    def __init__(
+        self,
+        debug: bool = False,
+        batch_size: int | None = None,
+        batch_max_wait: float | None = None,
+        consumers: int | None = None,
+        redis: Redis | None = None,
+        fixture_index: FixtureIndex | None = None,
+        team_aliases: TeamAliases | None = None,
+    ):
         self.debug = debug
+        self.stats = copy.deepcopy(self.stats)
 
-        self.redis = redis_connect(RedisDB.PARSERS)
-        self.session = SessionLocal()
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if batch_max_wait is not None:
+            self.batch_max_wait = batch_max_wait
+        if consumers is not None:
+            self.consumers = consumers
+
+        # redis connection, fixture index and team aliases can be shared by listeners of one process
+        if redis is None:
+            redis = redis_connect(RedisDB.PARSERS)
+        self.redis = redis
+
+        # locks of the fixtures whose bets are being written by a consumer
+        self._fixture_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+
+        if fixture_index is None:
+            fixture_index = FixtureIndex()
+        self.fixture_index = fixture_index
+        if team_aliases is None:
+            team_aliases = TeamAliases()
+        self.team_aliases = team_aliases
+        self.event_urls = EventUrlCache(self.redis)
+        self.odds_hashes = OddsHashCache(self.redis)
+        self.unmatched_events = TTLCache(
+            self.negative_cache_size, self.negative_cache_ttl
+        )
+        # unmatched events are matched again after the next fixture import
+        self.dead_letters = DeadLetterStore(self.redis)
+        self.failed_events = FailedEventStore(self.redis)
+        self._decoder = EventDecoder(self.event_cls)
+
+        # time spent per processing stage. Stages of concurrent consumers overlap
+        self.timer = StageTimer()
+
+        # set while the listener runs in pipelined mode
+        self.pipeline: EventPipeline | None = None
+
+        self.batching = (
+            AdaptiveBatching(
+                self.consumers, max_size=self.batch_size, max_wait=self.batch_max_wait
+            )
+            if self.adaptive_batching
+            else None
+        )
+
+        # list queues or a redis stream, see LISTENER_TRANSPORT
+        self.transport = make_transport(
+            self.redis, [self.event_queue], self.batch_size, self.batch_max_wait
+        )
 
     @property
     @abstractmethod
@@ -71,9 +239,43 @@ class ParserListener(ABC):
         pass
 
     @abstractmethod
-    def convert_bet(self, event, event_date, fixture) -> Bet:
+    def convert_bet(self, event, event_date, fixture_id: int) -> T:
         pass
 
+    def decode_event(self, data: bytes) -> T:
+        """Decode and validate a json or MessagePack payload, odds are converted to numbers"""
+        return self._decoder.decode(data)
+
+    def decode_events(self, raw_events: list[bytes]) -> list[T]:
+        """Decode a batch of payloads, malformed ones are logged and dropped"""
+        events, _ = self.decode_received(raw_events, [0.0] * len(raw_events))
+        return events
+
+    def decode_received(
+        self, raw_events: list[bytes], received_at: list[float]
+    ) -> tuple[list[T], list[float]]:
+        """Decode a batch of payloads and the times they were received.
+        Requeued payloads keep the time they were first received.
+        Malformed ones are logged and dropped"""
+        events = []
+        times = []
+        with self.timer.measure("decode"):
+            for raw, raw_received_at in zip(raw_events, received_at):
+                raw, first_received_at = split_requeued(raw)
+                try:
+                    events.append(self.decode_event(raw))
+                except msgspec.DecodeError as e:
+                    self.stats["total_events"] += 1
+                    self.stats["errors"]["malformed"] += 1
+                    logging.error(
+                        f"Malformed {self.event_queue} event: {e}. {raw[:500]}"
+                    )
+                    continue
+
+                times.append(first_received_at or raw_received_at)
+
+        return events, times
+
     async def get_event(self) -> T:
         # append event to the same queue in debug mode
         if self.debug:
@@ -81,11 +283,11 @@ class ParserListener(ABC):
                 self.event_queue, self.event_queue, timeout=0, src="RIGHT", dest="LEFT"
             )
 
-            event = self.event_cls(**json.loads(data))
+            event = self.decode_event(data)
         else:
             data = await self.redis.brpop([self.event_queue])
-            print(data[1])
-            event = self.event_cls(**json.loads(data[1]))
+            logging.debug(f"Popped {self.event_queue} event {data[1]}")
+            event = self.decode_event(data[1])
 
         return event
 
@@ -98,6 +300,24 @@ class ParserListener(ABC):
         return True
 
     async def process_events(self):
+        if self.pipelined and not self.debug:
+            self.pipeline = EventPipeline(
+                self.transport,
+                {self.event_queue: self},
+                self.consumers,
+                self.pipeline_depth,
+            )
+            await self.pipeline.run()
+            return
+
+        # debug mode recycles the queue, so only one consumer is used
+        consumers = 1 if self.debug else self.consumers
+        await asyncio.gather(*(self.consume() for _ in range(consumers)))
+
+    async def consume(self):
+        """Pop and process batches of events, every batch with a session of its own.
+        A session keeps every object it loaded, so a long-lived one grows without bounds
+        """
         debug_break_count = 0
         while True:
             # limit number of processed items in debug mode
@@ -106,7 +326,178 @@ class ParserListener(ABC):
                 if debug_break_count > self.debug_limit:
                     break
 
-            event = await self.get_event()
+            if self.debug:
+                event = await self.get_event()
+                async with SessionLocal() as session:
+                    await self.write_events([event], session, received_at=[time.time()])
+                continue
+
+            for batch in await self.transport.read():
+                async with SessionLocal() as session:
+                    await self.process_raw_batch(batch, session)
+
+    async def process_raw_batch(self, batch: EventBatch, session: AsyncSession):
+        """Decode and process a batch read from the transport"""
+        events, received_at = self.prepare_events(batch)
+        await self.write_batch(batch, events, session, received_at=received_at)
+
+    async def write_batch(
+        self,
+        batch: EventBatch,
+        events: list[T],
+        session: AsyncSession,
+        event_dates: list[datetime.datetime | None] | None = None,
+        received_at: list[float] | None = None,
+    ):
+        """Process the prepared events of a batch read from the transport.
+        The batch is acknowledged only after its bets are committed"""
+        start = time.perf_counter()
+        await self.write_events(events, session, event_dates, received_at)
+        if self.batching:
+            self.batching.observe(len(events), time.perf_counter() - start)
+
+        await self.transport.ack(batch)
+
+    async def write_events(
+        self,
+        events: list[T],
+        session: AsyncSession,
+        event_dates: list[datetime.datetime | None] | None = None,
+        received_at: list[float] | None = None,
+    ):
+        """Process a batch, one event at a time if the batch fails.
+        Events that fail on their own are logged and kept in the failed event store,
+        so one bad event or a db error doesn't take down the consumer"""
+        if event_dates is None:
+            event_dates = [None] * len(events)
+        if received_at is None:
+            received_at = [time.time()] * len(events)
+
+        try:
+            await self.process_batch(events, session, event_dates, received_at)
+            return
+        except Exception:
+            await session.rollback()
+            if len(events) == 1:
+                await self.fail_event(events[0], event_dates[0], received_at[0])
+                return
+
+            logging.exception(
+                f"Batch of {len(events)} {self.event_queue} events failed, "
+                f"retrying them one by one"
+            )
+
+        for event, event_date, event_received_at in zip(
+            events, event_dates, received_at
+        ):
+            try:
+                await self.process_batch(
+                    [event], session, [event_date], [event_received_at]
+                )
+            except Exception:
+                await session.rollback()
+                await self.fail_event(event, event_date, event_received_at)
+
+    async def fail_event(
+        self, event: T, event_date: datetime.datetime | None, received_at: float
+    ):
+        logging.exception(f"Failed to write {self.event_queue} event {event}")
+        self.stats["total_events"] += 1
+        self.stats["errors"]["failed"] += 1
+
+        if not event.event_url:
+            return
+
+        try:
+            await self.failed_events.add_many(
+                self.event_queue, {event.event_url: (event, event_date, received_at)}
+            )
+        except Exception:
+            logging.exception(f"Couldn't store the failed event {event.event_url}")
+
+    def prepare_events(self, batch: EventBatch) -> tuple[list[T], list[float]]:
+        """Decode the payloads of a batch and coalesce copies of the same event.
+        Returns the events and the times they were received"""
+        received_at = batch.received_at or [time.time()] * len(batch.events)
+        events, received_at = self.decode_received(batch.events, received_at)
+        if self.coalesce:
+            events, received_at = self.coalesce_events(events, received_at)
+
+        return events, received_at
+
+    def parse_dates(self, events: list[T]) -> list[datetime.datetime | None]:
+        """Kickoff dates of the events, parsed ahead of processing in pipelined mode"""
+        with self.timer.measure("dateparse"):
+            return [parse_event_datetime(event.datetime) for event in events]
+
+    @asynccontextmanager
+    async def lock_fixtures(self, fixture_ids: Iterable[int]):
+        """Make sure that only one consumer writes bets of the given fixtures"""
+        # locks are always taken in the same order, so consumers can't deadlock
+        locks = [
+            self._fixture_locks.setdefault(fixture_id, asyncio.Lock())
+            for fixture_id in sorted(set(fixture_ids))
+        ]
+
+        acquired = []
+        try:
+            for lock in locks:
+                await lock.acquire()
+                acquired.append(lock)
+
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    def coalesce_events(
+        self, events: list[T], received_at: list[float]
+    ) -> tuple[list[T], list[float]]:
+        """Drop events of a batch that have a newer copy with the same event_url.
+        The copy received last wins, ties go to the later one in queue order.
+        Requeued dead letters keep their receive time, so they can be behind newer copies.
+        Returns the remaining events and the times they were received"""
+        latest = {}
+        for position, (event, event_received_at) in enumerate(zip(events, received_at)):
+            key = event.event_url or position
+            if key in latest and latest[key][1] > event_received_at:
+                continue
+
+            # re-inserted keys move to the end, the batch stays in queue order
+            latest.pop(key, None)
+            latest[key] = (event, event_received_at)
+
+        coalesced = len(events) - len(latest)
+        if coalesced:
+            self.stats["total_events"] += coalesced
+            self.stats["coalesced"] += coalesced
+
+        return (
+            [event for event, _ in latest.values()],
+            [event_received_at for _, event_received_at in latest.values()],
+        )
+
+    async def process_batch(
+        self,
+        events: list[T],
+        session: AsyncSession,
+        event_dates: list[datetime.datetime | None] | None = None,
+        received_at: list[float] | None = None,
+    ):
+        """Match all events of a batch, upsert their bets with one statement
+        and commit them in one transaction.
+        event_dates are the already parsed kickoff dates of the events, if any.
+        received_at are the times the events entered redis, a bet is only
+        overwritten by an event received after the one that wrote it"""
+        if event_dates is None:
+            event_dates = [None] * len(events)
+        if received_at is None:
+            received_at = [time.time()] * len(events)
+
+        results = []
+        for event, event_date, event_received_at in zip(
+            events, event_dates, received_at
+        ):
             if not await self.check_event(event):
                 logging.error(
                     f"Event has None values in home_win, draw, away_win fields: {event}"
@@ -115,31 +506,225 @@ class ParserListener(ABC):
 
             logging.info(f"Processing event {event}")
 
-            status = await self.handle_event(event, self.session)
+            results.append(
+                await self.handle_event(event, session, event_date, event_received_at)
+            )
+
+        bets = [result.bet for result in results if result.bet]
+        async with self.lock_fixtures(bet["fixture_id"] for bet in bets):
+            with self.timer.measure("upsert"):
+                written = await upsert_bets(bets, session) if bets else []
+            with self.timer.measure("commit"):
+                await session.commit()
+
+        # aliases learned by any consumer, in a transaction of their own
+        if self.team_aliases.pending:
+            await self.team_aliases.flush(session)
+
+        inserted = {row.fixture_id for row in written if row.inserted}
+        updated = {row.fixture_id for row in written if not row.inserted}
+        for result in results:
+            if result.bet:
+                if result.fixture_id in inserted:
+                    result.status = ProcessStatus.Added
+                elif result.fixture_id in updated:
+                    result.status = ProcessStatus.Updated
+                else:
+                    # the stored bet is newer, its digest stays
+                    result.status = ProcessStatus.Stale
+                    result.odds_digest = None
+
+        await self.odds_hashes.set_many(
+            self.event_queue,
+            {
+                result.fixture_id: result.odds_digest
+                for result in results
+                if result.odds_digest
+            },
+        )
+
+        # the newest copy of an unmatched event wins
+        await self.dead_letters.add_many(
+            self.event_queue,
+            {
+                result.unmatched[0].event_url: result.unmatched
+                for result in results
+                if result.unmatched and result.unmatched[0].event_url
+            },
+        )
+
+        self.stats["batches"] += 1
+        for result in results:
+            self.update_stats(result.status)
+
+    def update_stats(self, status: ProcessStatus):
+        self.stats["total_events"] += 1
+
+        if status == ProcessStatus.Added:
+            self.stats["added"] += 1
+        elif status == ProcessStatus.Updated:
+            self.stats["updated"] += 1
+        elif status == ProcessStatus.Unchanged:
+            self.stats["unchanged"] += 1
+        elif status == ProcessStatus.Stale:
+            self.stats["stale"] += 1
+        elif status == ProcessStatus.NotFoundError:
+            self.stats["errors"]["not_found"] += 1
+        elif status == ProcessStatus.DateParseError:
+            self.stats["errors"]["dateparse_error"] += 1
+
+    async def handle_event(
+        self,
+        event,
+        session: AsyncSession,
+        event_date: datetime.datetime | None = None,
+        received_at: float | None = None,
+    ) -> EventResult:
+        """Match the event to a fixture and prepare its bet.
+        Bets are written for the whole batch in process_batch"""
+        with self.timer.measure("match"):
+            known = await self.find_known_fixture(event, session)
+        if known:
+            # event was matched before, the kickoff date is already known
+            fixture_id, event_date = known
+        else:
+            if not event_date:
+                with self.timer.measure("dateparse"):
+                    event_date = parse_event_datetime(event.datetime)
+            if not event_date:
+                logging.warning(f"Couldn't parse date for event: {event}.\nSkipping...")
+                return EventResult(ProcessStatus.DateParseError)
+
+            unmatched_key = (
+                self.fixture_index.generation,
+                self.event_queue,
+                normalize_name(event.home_team_name),
+                normalize_name(event.away_team_name),
+                match_day(event_date),
+            )
+            if self.unmatched_events.get(unmatched_key):
+                self.stats["negative_cache"]["hits"] += 1
+                logging.debug(f"Event {event} was not matched recently. Skipping...")
+                return EventResult(
+                    ProcessStatus.NotFoundError,
+                    unmatched=(event, event_date, received_at),
+                )
+
+            self.stats["negative_cache"]["misses"] += 1
+
+            with self.timer.measure("match"):
+                fixture = await self.find_fixture(event, event_date, session)
+            if not fixture:
+                self.unmatched_events.set(unmatched_key, True)
+                logging.warning(
+                    f"Couldn't find fixture with soft search for event {event}.\nSkipping..."
+                )
+                return EventResult(
+                    ProcessStatus.NotFoundError,
+                    unmatched=(event, event_date, received_at),
+                )
+
+            fixture_id = fixture.id
+            if event.event_url:
+                await self.event_urls.set(
+                    self.event_queue, event.event_url, fixture.id, fixture.date
+                )
+
+        # TODO: improve naming/call order to be more understandable
+        bet = self.convert_bet(event, event_date, fixture_id)
+
+        odds = get_bet_odds(bet)
+
+        # parsers push the same odds on every scrape, skip the write if nothing changed
+        digest = odds_digest(odds)
+        if digest == await self.odds_hashes.get(self.event_queue, fixture_id):
+            return EventResult(ProcessStatus.Unchanged, fixture_id)
+
+        bet_values = {
+            "fixture_id": fixture_id,
+            # TODO: fix naming, shouldn't use something more apparent than event_queue
+            "bookmaker": self.event_queue,
+            "event_url": bet.event_url,
+            # time the event entered redis, older events don't overwrite the bet
+            "received_at": datetime.datetime.fromtimestamp(
+                received_at or time.time(), datetime.timezone.utc
+            ),
+            **odds,
+        }
+
+        return EventResult(None, fixture_id, digest, bet_values)
 
-            self.stats["total_events"] += 1
+    async def find_known_fixture(
+        self, event: T, session: AsyncSession
+    ) -> tuple[int, datetime.datetime] | None:
+        """Resolve events that were matched before by their event_url,
+        skipping date parsing and team name matching.
+        Returns fixture id and date"""
+        if not event.event_url:
+            return None
 
-            if status == ProcessStatus.Added:
-                self.stats["added"] += 1
-            elif status == ProcessStatus.Updated:
-                self.stats["updated"] += 1
-            elif status.NotFoundError:
-                self.stats["errors"]["not_found"] += 1
-            elif status.DateParseError:
-                self.stats["errors"]["dateparse_error"] += 1
+        known = await self.event_urls.get(self.event_queue, event.event_url)
+        if not known:
+            known = await find_bet_fixture(self.event_queue, event.event_url, session)
+            if known:
+                await self.event_urls.set(self.event_queue, event.event_url, *known)
+
+        if not known:
+            self.stats["event_url_cache"]["misses"] += 1
+            return None
+
+        fixture_id, fixture_date = known
+        # started fixtures are not updated anymore
+        if fixture_date <= datetime.datetime.now(datetime.timezone.utc):
+            self.stats["event_url_cache"]["misses"] += 1
+            return None
+
+        # the index holds every upcoming fixture, a cached id that isn't in it
+        # belongs to a deleted fixture and would fail the bet foreign key
+        if not self.fixture_index.get(fixture_id):
+            self.stats["event_url_cache"]["stale"] += 1
+            await self.event_urls.delete(self.event_queue, event.event_url)
+            return None
+
+        self.stats["event_url_cache"]["hits"] += 1
+        return fixture_id, fixture_date
+
+    async def find_fixture(
+        self, event: T, event_date, session: AsyncSession
+    ) -> IndexedFixture | None:
+        """Match the event against the fixture index, by the team aliases
+        of the bookmaker first. Queries the db only on a miss"""
+        home_team_source_id = self.team_aliases.get(
+            self.event_queue, event.home_team_name
+        )
+        away_team_source_id = self.team_aliases.get(
+            self.event_queue, event.away_team_name
+        )
+        if home_team_source_id is not None and away_team_source_id is not None:
+            fixture = self.fixture_index.match_teams(
+                home_team_source_id, away_team_source_id, event_date
+            )
+            if fixture:
+                self.stats["team_aliases"]["hits"] += 1
+                return fixture
+
+        fixture = self.fixture_index.match(
+            event.home_team_name, event.away_team_name, event_date
+        )
+        if fixture:
+            self.stats["fixture_index"]["hits"] += 1
+        else:
+            self.stats["fixture_index"]["misses"] += 1
+            fixture = await self.find_fixture_db(event, event_date, session)
 
-    async def handle_event(self, event, session: AsyncSession) -> ProcessStatus:
-        event_date = dateparser.parse(event.datetime)
-        if not event_date:
-            logging.warning(f"Couldn't parse date for event: {event}.\nSkipping...")
-            return ProcessStatus.DateParseError
+        if fixture:
+            self.learn_team_aliases(event, fixture)
 
-        # TODO: this should be properly via some sort of sanitize process
-        event.away_team_name = event.away_team_name.replace("(", "")
-        event.away_team_name = event.away_team_name.replace(")", "")
-        event.home_team_name = event.home_team_name.replace("(", "")
-        event.home_team_name = event.home_team_name.replace(")", "")
+        return fixture
 
+    async def find_fixture_db(
+        self, event: T, event_date, session: AsyncSession
+    ) -> IndexedFixture | None:
         fixture = await find_fixture_ilike(
             event.home_team_name, event.away_team_name, event_date, session
         )
@@ -149,37 +734,252 @@ class ParserListener(ABC):
                 f"Couldn't find fixture for event {event}. Trying soft search"
             )
 
-            fixture = await find_fixture_partial(
+            fixture = await find_fixture_similar(
                 event.home_team_name, event.away_team_name, event_date, session
             )
 
-            if not fixture:
-                logging.warning(
-                    f"Couldn't find fixture with soft search for event {event}.\nSkipping..."
-                )
-                return ProcessStatus.NotFoundError
+        if not fixture:
+            return None
 
-        # TODO: improve naming/call order to be more understandable
-        bet = self.convert_bet(event, event_date, fixture)
+        return self.fixture_index.add(
+            fixture.id,
+            fixture.date,
+            fixture.home_team_name,
+            fixture.away_team_name,
+            fixture.home_team_source_id,
+            fixture.away_team_source_id,
+        )
 
-        normalized_bet = CommonEvent(**asdict(bet))
-        # TODO: fix naming, shouldn't use something more apparent than event_queue
-        updated = await upsert_bet(normalized_bet, fixture, self.event_queue, session)
-        await session.commit()
+    def learn_team_aliases(self, event: T, fixture: IndexedFixture):
+        """Remember how the bookmaker spells the teams of a matched fixture"""
+        for name, fixture_name, team_source_id in (
+            (
+                event.home_team_name,
+                fixture.home_team_name,
+                fixture.home_team_source_id,
+            ),
+            (
+                event.away_team_name,
+                fixture.away_team_name,
+                fixture.away_team_source_id,
+            ),
+        ):
+            # fixture names in the index are normalized
+            exact = normalize_name(name) == fixture_name
+            if self.team_aliases.learn(self.event_queue, name, team_source_id, exact):
+                self.stats["team_aliases"]["learned"] += 1
 
-        if updated:
-            return ProcessStatus.Updated
-        else:
-            return ProcessStatus.Added
+    def log_stats(self):
+        self.stats["fixture_index"]["size"] = len(self.fixture_index)
+        self.stats["negative_cache"]["size"] = len(self.unmatched_events)
+        self.stats["team_aliases"]["size"] = len(self.team_aliases)
+        if self.pipeline:
+            self.stats["pipeline"] = self.pipeline.depths()
+        if self.batching:
+            self.stats["batching"] = self.batching.summary()
+        logging.info(f"Processing stats for {self.event_queue}: {self.stats}")
 
     async def print_stats(self):
         # log stats with timestamp asynchronously every 30 seconds
         while True:
-            logging.info(f"Processing stats: {self.stats}")
+            self.log_stats()
+            logging.info(f"Db pool: {pool_stats()}")
             await asyncio.sleep(self.stats_interval)
 
     async def start(self):
-        await asyncio.gather(self.process_events(), self.print_stats())
+        await self.transport.setup()
+        async with SessionLocal() as session:
+            await self.team_aliases.load(session)
+            # cached matches are checked against the index, it has to be loaded first
+            await self.fixture_index.refresh(session)
+
+        tasks = [
+            self.process_events(),
+            self.print_stats(),
+            self.fixture_index.watch(self.redis, self.fixture_index_interval),
+            self.team_aliases.watch(self.team_aliases_interval),
+        ]
+        if self.batching:
+            tasks.append(self.batching.run(self.transport))
+
+        await asyncio.gather(*tasks)
+
+
+class EventPipeline:
+    """Overlaps popping, decoding and writing of event batches.
+    Stages are connected by bounded queues: a full queue blocks the stage before it,
+    so a slow db stops the listener from popping more events than it can write"""
+
+    def __init__(
+        self,
+        transport,
+        listeners: dict[str, ParserListener],
+        consumers: int,
+        depth: int,
+    ):
+        self.transport = transport
+        # listener per queue name of the transport
+        self.listeners = listeners
+        self.consumers = consumers
+        # batches read from the transport
+        self.popped: asyncio.Queue[EventBatch] = asyncio.Queue(depth)
+        # decoded batches with the parsed kickoff dates and receive times of their events
+        self.prepared: asyncio.Queue[tuple] = asyncio.Queue(depth)
+
+    async def read(self):
+        while True:
+            for batch in await self.transport.read():
+                await self.popped.put(batch)
+
+    async def prepare(self):
+        while True:
+            batch = await self.popped.get()
+            listener = self.listeners[batch.queue]
+            events, received_at = listener.prepare_events(batch)
+            event_dates = listener.parse_dates(events)
+            await self.prepared.put((batch, listener, events, event_dates, received_at))
+
+    async def consume(self):
+        while True:
+            batch, listener, events, event_dates, received_at = (
+                await self.prepared.get()
+            )
+            async with SessionLocal() as session:
+                await listener.write_batch(
+                    batch, events, session, event_dates, received_at
+                )
+
+    def depths(self) -> dict[str, int]:
+        """Number of batches waiting per stage"""
+        return {"popped": self.popped.qsize(), "prepared": self.prepared.qsize()}
+
+    async def run(self):
+        await asyncio.gather(
+            self.read(),
+            self.prepare(),
+            *(self.consume() for _ in range(self.consumers)),
+        )
+
+
+class MultiQueueListener:
+    """Consumes the queues of several parser listeners in one process.
+    Events are dispatched to the listener of their queue. Listeners share
+    the redis connection, the db pool and the fixture index"""
+
+    stats_interval = 30
+
+    batch_size = LISTENER_BATCH_SIZE
+    batch_max_wait = LISTENER_BATCH_MAX_WAIT
+
+    # consumer tasks shared by all queues
+    consumers = LISTENER_CONSUMERS
+
+    pipelined = LISTENER_PIPELINE
+    pipeline_depth = LISTENER_PIPELINE_DEPTH
+
+    adaptive_batching = LISTENER_ADAPTIVE_BATCHING
+
+    def __init__(
+        self,
+        listener_classes: list[Type[ParserListener]],
+        batch_size: int | None = None,
+        batch_max_wait: float | None = None,
+        consumers: int | None = None,
+    ):
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if batch_max_wait is not None:
+            self.batch_max_wait = batch_max_wait
+        if consumers is not None:
+            self.consumers = consumers
+
+        self.redis = redis_connect(RedisDB.PARSERS)
+        self.fixture_index = FixtureIndex()
+        self.team_aliases = TeamAliases()
+
+        listeners = [
+            listener_cls(
+                redis=self.redis,
+                fixture_index=self.fixture_index,
+                team_aliases=self.team_aliases,
+            )
+            for listener_cls in listener_classes
+        ]
+        self.listeners = {listener.event_queue: listener for listener in listeners}
+
+        self.transport = make_transport(
+            self.redis, list(self.listeners), self.batch_size, self.batch_max_wait
+        )
+        # one batch size for all queues, adapted to their total lag
+        self.batching = (
+            AdaptiveBatching(
+                self.consumers, max_size=self.batch_size, max_wait=self.batch_max_wait
+            )
+            if self.adaptive_batching
+            else None
+        )
+
+        # listeners acknowledge the batches they wrote on the shared transport
+        # and report their write times to the shared batching
+        for listener in listeners:
+            listener.transport = self.transport
+            listener.batching = self.batching
+
+        self.pipeline: EventPipeline | None = None
+
+    async def consume(self):
+        """Pop and process batches of events from all queues, every batch with a session of its own"""
+        while True:
+            for batch in await self.transport.read():
+                listener = self.listeners[batch.queue]
+                events, received_at = listener.prepare_events(batch)
+                async with SessionLocal() as session:
+                    await listener.write_batch(
+                        batch, events, session, received_at=received_at
+                    )
+
+    async def process_events(self):
+        if self.pipelined:
+            self.pipeline = EventPipeline(
+                self.transport, self.listeners, self.consumers, self.pipeline_depth
+            )
+            await self.pipeline.run()
+            return
+
+        await asyncio.gather(*(self.consume() for _ in range(self.consumers)))
+
+    async def print_stats(self):
+        while True:
+            for listener in self.listeners.values():
+                listener.log_stats()
+            if self.pipeline:
+                logging.info(f"Pipeline queue depths: {self.pipeline.depths()}")
+            logging.info(f"Db pool: {pool_stats()}")
+
+            await asyncio.sleep(self.stats_interval)
+
+    async def start(self):
+        interval = min(
+            listener.fixture_index_interval for listener in self.listeners.values()
+        )
+        aliases_interval = min(
+            listener.team_aliases_interval for listener in self.listeners.values()
+        )
+        await self.transport.setup()
+        async with SessionLocal() as session:
+            await self.team_aliases.load(session)
+            await self.fixture_index.refresh(session)
+
+        tasks = [
+            self.process_events(),
+            self.print_stats(),
+            self.fixture_index.watch(self.redis, interval),
+            self.team_aliases.watch(aliases_interval),
+        ]
+        if self.batching:
+            tasks.append(self.batching.run(self.transport))
+
+        await asyncio.gather(*tasks)
 
 
 class BetcityListener(ParserListener):
@@ -191,9 +991,8 @@ class BetcityListener(ParserListener):
     def event_queue(self):
         return "betcity"
 
-    def convert_bet(self, event: BetcityEvent, event_date, fixture):
-        processed_event = convert_object_key_first_half_totals(event)
-        return processed_event
+    def convert_bet(self, event: BetcityEvent, event_date, fixture_id):
+        return event
 
 
 class PinnacleListener(ParserListener):
@@ -205,10 +1004,8 @@ class PinnacleListener(ParserListener):
     def event_queue(self):
         return "pinnacle"
 
-    def convert_bet(self, event: PinnacleEvent, event_date, fixture):
-        processed_event = convert_object_key_totals(event)
-        processed_event = convert_object_key_first_half_totals(processed_event)
-        return processed_event
+    def convert_bet(self, event: PinnacleEvent, event_date, fixture_id):
+        return event
 
 
 class MarathonListener(ParserListener):
@@ -220,10 +1017,8 @@ class MarathonListener(ParserListener):
     def event_queue(self):
         return "marathon"
 
-    def convert_bet(self, event: MarathonEvent, event_date, fixture):
-        processed_event = convert_object_key_totals(event)
-        processed_event = convert_object_key_first_half_totals(processed_event)
-        return processed_event
+    def convert_bet(self, event: MarathonEvent, event_date, fixture_id):
+        return event
 
 
 class FonbetListener(ParserListener):
@@ -235,5 +1030,13 @@ class FonbetListener(ParserListener):
     def event_queue(self):
         return "fonbet"
 
-    def convert_bet(self, event: BetcityEvent, event_date, fixture):
+    def convert_bet(self, event: FonbetEvent, event_date, fixture_id):
         return event
+
+
+LISTENERS: dict[str, Type[ParserListener]] = {
+    "betcity": BetcityListener,
+    "fonbet": FonbetListener,
+    "marathon": MarathonListener,
+    "pinnacle": PinnacleListener,
+}
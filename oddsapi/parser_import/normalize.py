@@ -0,0 +1,98 @@
+"""Team name normalization shared by the listener, the fixture index and the fixture import,
+so that incoming and stored names are compared the same way.
+Parsers send the same few thousand names over and over, results are cached per raw name
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# max number of distinct raw names cached per function
+CACHE_SIZE = 16384
+
+# words too common in team names to tell teams apart, dropped from match tokens
+BAN_WORDS = frozenset(
+    (
+        "fc",
+        "united",
+        "city",
+        "el",
+        "de",
+        "los",
+        "the",
+        "sc",
+        "club",
+        "town",
+        "al",
+        "real",
+        "cf",
+        "cfr",
+        "fk",
+    )
+)
+
+# age, reserve and women's team markers. Kept in match tokens whatever their length,
+# so "Spain U21" or "Arsenal W" don't look like the senior team
+QUALIFIER_RE = re.compile(r"u\d{2}|ii|iii|b|w|women|res|reserves?|youth|juniors?")
+
+# letters without a combining accent that unaccent() still folds
+LETTER_FOLDS = str.maketrans(
+    {
+        "ø": "o",
+        "Ø": "O",
+        "ł": "l",
+        "Ł": "L",
+        "đ": "d",
+        "Đ": "D",
+        "ı": "i",
+        "æ": "ae",
+        "Æ": "AE",
+        "œ": "oe",
+        "Œ": "OE",
+    }
+)
+
+# some parsers put part of the name in brackets, e.g. "Nacional (Montevideo)"
+BRACKETS_RE = re.compile(r"[()\[\]]")
+WHITESPACE_RE = re.compile(r"\s+")
+WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_name(name: str) -> str:
+    """Team name without brackets and repeated whitespace. Keeps case and accents,
+    this is the form fixture names are stored in"""
+    name = BRACKETS_RE.sub(" ", name)
+    return WHITESPACE_RE.sub(" ", name).strip()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_name(name: str) -> str:
+    """Cleaned team name without accents and casefolded,
+    the same way unaccent() + ILIKE compare"""
+    name = unicodedata.normalize("NFKD", clean_name(name).translate(LETTER_FOLDS))
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return name.casefold()
+
+
+def is_qualifier(word: str) -> bool:
+    return QUALIFIER_RE.fullmatch(word) is not None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def name_tokens(name: str) -> frozenset[str]:
+    """Words of a team name that are useful for matching. Ban words and single letters
+    are dropped, names of several words keep only the words longer than 3 chars.
+    Age, reserve and women's team qualifiers are always kept"""
+    words = WORD_RE.findall(normalize_name(name))
+    significant = [
+        word
+        for word in words
+        if (word not in BAN_WORDS and len(word) > 1) or is_qualifier(word)
+    ] or words
+    if len(significant) < 2:
+        return frozenset(significant)
+
+    return frozenset(
+        word for word in significant if len(word) > 3 or is_qualifier(word)
+    ) or frozenset(significant)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from oddsapi.database.init import SessionLocal
+from oddsapi.database.repository.team_alias import (
+    get_team_aliases,
+    upsert_team_aliases,
+)
+from oddsapi.parser_import.cache import LRUCache
+from oddsapi.parser_import.normalize import normalize_name
+
+# names that differ from the team name of the fixture are learned
+# once this many matches agreed on the same team
+ALIAS_MIN_VOTES = 3
+# names with votes kept in memory, names not matched for a long time are forgotten
+ALIAS_VOTES_SIZE = 20000
+
+
+class TeamAliases:
+    """Team source id per (bookmaker, normalized team name), learned from matched events.
+    Bookmakers keep spelling a team the same way, so once both teams of an event
+    are known the fixture is found by comparing source ids instead of names.
+    A wrong alias keeps matching events to the wrong fixture, so only the team name
+    itself is learned right away, other spellings after several agreeing matches"""
+
+    def __init__(self):
+        self._aliases: dict[tuple[str, str], int] = {}
+        # learned since the last flush
+        self._pending: dict[tuple[str, str], int] = {}
+        # matches per team of spellings that aren't learned yet
+        self._votes = LRUCache(ALIAS_VOTES_SIZE)
+
+    def __len__(self):
+        return len(self._aliases)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending)
+
+    async def load(self, session: AsyncSession):
+        """Replace the aliases in memory with the stored ones"""
+        self._aliases = {
+            (row.bookmaker, row.name): row.team_source_id
+            for row in await get_team_aliases(session)
+        }
+        # learned but not stored yet
+        self._aliases.update(self._pending)
+        logging.info(f"Loaded {len(self._aliases)} team aliases")
+
+    def get(self, bookmaker: str, name: str) -> int | None:
+        return self._aliases.get((bookmaker, normalize_name(name)))
+
+    def learn(
+        self, bookmaker: str, name: str, team_source_id: int, exact: bool
+    ) -> bool:
+        """Remember a name matched to a team, exact if it is the normalized team name
+        of the fixture. Returns True if the alias is new or points to another team"""
+        key = (bookmaker, normalize_name(name))
+        if self._aliases.get(key) == team_source_id:
+            return False
+
+        if not exact:
+            votes: dict[int, int] = self._votes.get(key) or {}
+            votes[team_source_id] = votes.get(team_source_id, 0) + 1
+            self._votes.set(key, votes)
+            if votes[team_source_id] < ALIAS_MIN_VOTES:
+                return False
+
+        self._votes.pop(key, None)
+        self._aliases[key] = team_source_id
+        self._pending[key] = team_source_id
+        return True
+
+    async def flush(self, session: AsyncSession):
+        """Store the aliases learned since the last flush and commit them"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        await upsert_team_aliases(
+            [
+                {"bookmaker": bookmaker, "name": name, "team_source_id": team_source_id}
+                for (bookmaker, name), team_source_id in pending.items()
+            ],
+            session,
+        )
+        await session.commit()
+
+    async def watch(self, interval: float):
+        """Reload the aliases every interval seconds, so aliases deleted
+        with `pdm run delete-team-aliases` are forgotten by running listeners"""
+        while True:
+            await asyncio.sleep(interval)
+            async with SessionLocal() as session:
+                await self.load(session)
@@ -0,0 +1,30 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Wall time spent per processing stage, accumulated since the last reset"""
+
+    def __init__(self):
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+            self.calls[stage] += 1
+
+    def reset(self):
+        self.seconds.clear()
+        self.calls.clear()
+
+    def summary(self) -> dict[str, float]:
+        """Milliseconds per stage"""
+        return {
+            stage: round(seconds * 1000, 1) for stage, seconds in self.seconds.items()
+        }
@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from oddsapi.settings import (
+    LISTENER_TRANSPORT,
+    LISTENER_STREAM_GROUP,
+    LISTENER_STREAM_CONSUMER,
+    LISTENER_STREAM_CLAIM_IDLE,
+    LISTENER_STREAM_MAX_DELIVERIES,
+    LISTENER_STREAM_CONSUMER_TTL,
+    DEADLETTER_MAX_SIZE,
+)
+
+
+async def pop_events(
+    redis: Redis, queues: list[str], batch_size: int, max_wait: float
+) -> tuple[str, list[bytes]]:
+    """Pop up to batch_size raw events from the first non-empty queue.
+    Blocks until an event arrives, then keeps popping from the same queue
+    until the batch is full or max_wait runs out.
+    Returns the queue name and the events"""
+    queue, raw_events = await redis.blmpop(
+        0, len(queues), *queues, direction="RIGHT", count=batch_size
+    )
+    queue = queue.decode()
+
+    deadline = time.monotonic() + max_wait
+    while len(raw_events) < batch_size:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+
+        # returns immediately if the queue is not empty
+        popped = await redis.blmpop(
+            timeout, 1, queue, direction="RIGHT", count=batch_size - len(raw_events)
+        )
+        if not popped:
+            break
+
+        raw_events.extend(popped[1])
+
+    return queue, raw_events
+
+
+@dataclass(slots=True)
+class EventBatch:
+    queue: str
+    events: list[bytes]
+    # stream entry ids of the events. Empty for list queues
+    entry_ids: list[bytes] = field(default_factory=list)
+    # unix time every event entered redis. Bets are only overwritten by newer events
+    received_at: list[float] = field(default_factory=list)
+
+
+def entry_time(entry_id: bytes) -> float:
+    """Unix time of a stream entry, taken from the milliseconds part of its id"""
+    return int(entry_id.split(b"-")[0]) / 1000
+
+
+class ListTransport:
+    """Parsers lpush events to a list per bookmaker, listeners pop them.
+    Popped events are gone, so a queue can only have one listener process"""
+
+    def __init__(
+        self, redis: Redis, queues: list[str], batch_size: int, max_wait: float
+    ):
+        self.redis = redis
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+
+        # blmpop pops from the first non-empty queue, the order is rotated
+        # on every pop so that a busy queue can't starve the others
+        self._queues = deque(queues)
+        # consumers pop one after another, so later pops get later receive times
+        self._pop_lock = asyncio.Lock()
+
+    async def setup(self):
+        pass
+
+    async def read(self) -> list[EventBatch]:
+        async with self._pop_lock:
+            self._queues.rotate(-1)
+            queue, raw_events = await pop_events(
+                self.redis, list(self._queues), self.batch_size, self.max_wait
+            )
+            # lists don't keep the push time, the pop time keeps the queue order
+            received_at = time.time()
+
+        return [
+            EventBatch(queue, raw_events, received_at=[received_at] * len(raw_events))
+        ]
+
+    async def ack(self, batch: EventBatch):
+        pass
+
+    async def lag(self) -> int:
+        """Number of events waiting in the queues"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for queue in self._queues:
+                pipe.llen(queue)
+            return sum(await pipe.execute())
+
+
+def stream_key(queue: str) -> str:
+    return f"{queue}:stream"
+
+
+def stream_deadletter_key(queue: str) -> str:
+    """List of the payloads of entries that failed too often"""
+    return f"{stream_key(queue)}:deadletter"
+
+
+class StreamTransport:
+    """Parsers xadd events to a stream per bookmaker (`{queue}:stream`, field `data`),
+    listeners read them through a consumer group. Any number of listener processes
+    can share a stream. Entries are acknowledged only after their batch is committed,
+    entries of a crashed listener are claimed by another one after claim_idle seconds.
+    Entries delivered more than max_deliveries times are moved to a dead letter list"""
+
+    data_field = b"data"
+
+    # max time in seconds a read blocks, pending entries are only checked in between
+    block_timeout = 5
+
+    # xautoclaim cursor of a finished scan
+    scan_done = "0-0"
+
+    def __init__(
+        self,
+        redis: Redis,
+        queues: list[str],
+        batch_size: int,
+        max_wait: float,
+        group: str = LISTENER_STREAM_GROUP,
+        consumer: str = LISTENER_STREAM_CONSUMER,
+        claim_idle: float = LISTENER_STREAM_CLAIM_IDLE,
+        max_deliveries: int = LISTENER_STREAM_MAX_DELIVERIES,
+        consumer_ttl: float = LISTENER_STREAM_CONSUMER_TTL,
+    ):
+        self.redis = redis
+        self.queues = queues
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.group = group
+        self.consumer = consumer
+        self.claim_idle = claim_idle
+        self.max_deliveries = max_deliveries
+        self.consumer_ttl = consumer_ttl
+
+        self._streams = {stream_key(queue): queue for queue in queues}
+        self._claimed_at = 0.0
+        # where the pending entries scan of every stream continues
+        self._claim_cursors = {stream: self.scan_done for stream in self._streams}
+        # entries read by the consumer tasks of this process and not acknowledged yet.
+        # All tasks read as the same consumer, its pending entries include them
+        self._in_flight: set[bytes] = set()
+
+    async def setup(self):
+        """Create the consumer group of every stream"""
+        for stream in self._streams:
+            try:
+                # a new group starts with the entries that are already in the stream
+                await self.redis.xgroup_create(
+                    stream, self.group, id="0", mkstream=True
+                )
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def read(self) -> list[EventBatch]:
+        """Read up to batch_size new entries per stream. Entries that are pending
+        for longer than claim_idle are taken over first"""
+        while True:
+            # a scan of the pending entries continues on every read until it is done
+            if self.claiming or time.monotonic() - self._claimed_at > self.claim_idle:
+                if not self.claiming:
+                    self._claimed_at = time.monotonic()
+                    await self.remove_idle_consumers()
+
+                batches = await self.claim_pending()
+                if batches:
+                    return batches
+
+            response = await self.redis.xreadgroup(
+                self.group,
+                self.consumer,
+                {stream: ">" for stream in self._streams},
+                count=self.batch_size,
+                block=int(self.block_timeout * 1000),
+            )
+            if response:
+                break
+
+        batches = [self._make_batch(stream, entries) for stream, entries in response]
+
+        # wait for the batches to fill up, same as the list transport does
+        deadline = time.monotonic() + self.max_wait
+        for batch in batches:
+            while len(batch.events) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+
+                response = await self.redis.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {stream_key(batch.queue): ">"},
+                    count=self.batch_size - len(batch.events),
+                    block=max(int(timeout * 1000), 1),
+                )
+                if not response:
+                    break
+
+                self._extend_batch(batch, response[0][1])
+
+        return batches
+
+    @property
+    def claiming(self) -> bool:
+        """Whether a scan of the pending entries is in progress"""
+        return any(cursor != self.scan_done for cursor in self._claim_cursors.values())
+
+    async def claim_pending(self) -> list[EventBatch]:
+        """Take over up to batch_size entries per stream that were delivered to a listener
+        but never acknowledged. Continues the scan of the previous call,
+        the scan is done when every cursor is back at 0-0"""
+        batches = []
+        for stream in self._streams:
+            while True:
+                cursor, entries, *_ = await self.redis.xautoclaim(
+                    stream,
+                    self.group,
+                    self.consumer,
+                    int(self.claim_idle * 1000),
+                    start_id=self._claim_cursors[stream],
+                    count=self.batch_size,
+                )
+                if isinstance(cursor, bytes):
+                    cursor = cursor.decode()
+                self._claim_cursors[stream] = cursor
+
+                # still being written by another consumer task, not taken over twice
+                entries = [
+                    entry for entry in entries if entry[0] not in self._in_flight
+                ]
+                entries = await self.drop_failing(stream, entries)
+                if entries or cursor == self.scan_done:
+                    break
+
+            if entries:
+                logging.warning(
+                    f"Claimed {len(entries)} pending entries of stream {stream}"
+                )
+                batches.append(self._make_batch(stream, entries))
+
+        return batches
+
+    async def drop_failing(self, stream: str, entries: list) -> list:
+        """Move claimed entries that were delivered more than max_deliveries times
+        to the dead letter list of their queue and acknowledge them.
+        Returns the remaining entries"""
+        if not entries:
+            return entries
+
+        # delivery count of exactly the claimed entries, a range of ids could
+        # include entries of other consumers or consumer tasks
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for entry_id, _ in entries:
+                pipe.xpending_range(
+                    stream, self.group, min=entry_id, max=entry_id, count=1
+                )
+            pending = await pipe.execute()
+
+        deliveries = {
+            item["message_id"]: item["times_delivered"]
+            for items in pending
+            for item in items
+        }
+
+        failing = [
+            (entry_id, fields)
+            for entry_id, fields in entries
+            if deliveries.get(entry_id, 0) > self.max_deliveries
+        ]
+        if not failing:
+            return entries
+
+        queue = self._streams[stream]
+        payloads = [
+            fields[self.data_field]
+            for _, fields in failing
+            if fields and self.data_field in fields
+        ]
+        logging.error(
+            f"Moving {len(failing)} entries of stream {stream} delivered more than "
+            f"{self.max_deliveries} times to {stream_deadletter_key(queue)}"
+        )
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if payloads:
+                pipe.lpush(stream_deadletter_key(queue), *payloads)
+                pipe.ltrim(stream_deadletter_key(queue), 0, DEADLETTER_MAX_SIZE - 1)
+            pipe.xack(stream, self.group, *(entry_id for entry_id, _ in failing))
+            await pipe.execute()
+
+        failing_ids = {entry_id for entry_id, _ in failing}
+        return [entry for entry in entries if entry[0] not in failing_ids]
+
+    async def remove_idle_consumers(self):
+        """Delete consumers of other listeners that were idle for consumer_ttl seconds
+        and have no pending entries left, so restarted listeners don't pile up"""
+        for stream in self._streams:
+            for consumer in await self.redis.xinfo_consumers(stream, self.group):
+                name = consumer["name"]
+                if isinstance(name, bytes):
+                    name = name.decode()
+
+                if (
+                    name != self.consumer
+                    and consumer["pending"] == 0
+                    and consumer["idle"] > self.consumer_ttl * 1000
+                ):
+                    await self.redis.xgroup_delconsumer(stream, self.group, name)
+                    logging.info(f"Removed idle consumer {name} of stream {stream}")
+
+    async def ack(self, batch: EventBatch):
+        if batch.entry_ids:
+            await self.redis.xack(stream_key(batch.queue), self.group, *batch.entry_ids)
+            self._in_flight.difference_update(batch.entry_ids)
+
+    async def lag(self) -> int:
+        """Number of entries not yet delivered to the consumer group"""
+        lag = 0
+        for stream in self._streams:
+            for group in await self.redis.xinfo_groups(stream):
+                name = group["name"]
+                if isinstance(name, bytes):
+                    name = name.decode()
+                # lag is reported since redis 7 and is None if it can't be determined
+                if name == self.group:
+                    lag += group.get("lag") or 0
+
+        return lag
+
+    def _make_batch(self, stream: bytes | str, entries: list) -> EventBatch:
+        if isinstance(stream, bytes):
+            stream = stream.decode()
+
+        batch = EventBatch(self._streams[stream], [])
+        self._extend_batch(batch, entries)
+
+        return batch
+
+    def _extend_batch(self, batch: EventBatch, entries: list):
+        for entry_id, fields in entries:
+            batch.entry_ids.append(entry_id)
+            self._in_flight.add(entry_id)
+            # fields are None if the entry was trimmed from the stream while pending
+            if fields and self.data_field in fields:
+                batch.events.append(fields[self.data_field])
+                batch.received_at.append(entry_time(entry_id))
+
+
+async def push_events(redis: Redis, queue: str, payloads: list[bytes]):
+    """Push payloads to a parser queue the way parsers do"""
+    if not payloads:
+        return
+
+    if LISTENER_TRANSPORT == "stream":
+        async with redis.pipeline(transaction=False) as pipe:
+            for payload in payloads:
+                pipe.xadd(stream_key(queue), {StreamTransport.data_field: payload})
+            await pipe.execute()
+    else:
+        # listeners pop from the right, so these are processed before newer events
+        await redis.rpush(queue, *payloads)
+
+
+def make_transport(
+    redis: Redis, queues: list[str], batch_size: int, max_wait: float
+) -> ListTransport | StreamTransport:
+    """Transport selected by the LISTENER_TRANSPORT setting"""
+    if LISTENER_TRANSPORT == "stream":
+        return StreamTransport(redis, queues, batch_size, max_wait)
+
+    return ListTransport(redis, queues, batch_size, max_wait)
@@ -0,0 +1,47 @@
+import struct
+
+import msgspec
+
+# parsers can push MessagePack instead of json by prefixing the payload with this byte.
+# json payloads never start with it, so both formats can share a queue
+MSGPACK_VERSION = b"\x01"
+# payloads pushed back to their queue by the listener itself are prefixed with this byte
+# and the time the event was first received, followed by the original payload
+REQUEUED_VERSION = b"\x02"
+RECEIVED_AT = struct.Struct(">d")
+
+
+def encode_msgpack(event: msgspec.Struct | dict) -> bytes:
+    """Payload in the MessagePack wire format"""
+    return MSGPACK_VERSION + msgspec.msgpack.encode(event)
+
+
+def encode_requeued(payload: bytes, received_at: float) -> bytes:
+    """Payload pushed back to its queue that keeps the time it was first received,
+    so it doesn't overwrite odds of events received after it"""
+    return REQUEUED_VERSION + RECEIVED_AT.pack(received_at) + payload
+
+
+def split_requeued(data: bytes) -> tuple[bytes, float | None]:
+    """Original payload of a requeued payload and the time it was first received.
+    Other payloads are returned as they are, without a time"""
+    if data[:1] != REQUEUED_VERSION:
+        return data, None
+
+    (received_at,) = RECEIVED_AT.unpack_from(data, 1)
+    return data[1 + RECEIVED_AT.size :], received_at
+
+
+class EventDecoder:
+    """Decodes json or MessagePack payloads straight into an event schema"""
+
+    def __init__(self, event_cls: type[msgspec.Struct]):
+        self._json = msgspec.json.Decoder(event_cls)
+        self._msgpack = msgspec.msgpack.Decoder(event_cls)
+
+    def decode(self, data: bytes):
+        data, _ = split_requeued(data)
+        if data[:1] == MSGPACK_VERSION:
+            return self._msgpack.decode(memoryview(data)[1:])
+
+        return self._json.decode(data)
@@ -3,6 +3,7 @@ import datetime
 from arq import cron
 from arq.connections import RedisSettings
 
+from oddsapi.database.init import use_engine_profile
 from oddsapi.database.redis_connection import RedisDB
 from oddsapi.helpers import time_now, configure_logging
 from oddsapi.tgbot.tgbot import run_tg_notify
@@ -27,6 +28,7 @@ async def download_content(ctx, url):
 
 async def startup(ctx):
     configure_logging()
+    use_engine_profile("worker")
 
 
 async def shutdown(ctx):
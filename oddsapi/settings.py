@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import socket
 
 from dotenv import load_dotenv
 
@@ -17,6 +18,8 @@ UI_PASSWORD = os.environ.get("UI_PASSWORD")
 BET_PARSE_DAYS = 12
 # сколько дней матчей загружать
 FIXTURE_PARSE_DAYS = 31
+# load api imports through a COPY staging table instead of multi-row inserts. 1 enables
+IMPORT_COPY = os.environ.get("IMPORT_COPY", default="0") == "1"
 
 # настройки фильтров для ставок
 # отклонение от среднего
@@ -26,6 +29,55 @@ MAX_ODDS = 6.5
 # референсный букмекер. Отображаются только события, которые есть у этого букмекера
 REFERENCE_BOOKMAKER = "fonbet"
 
+# parser listener batching
+# max number of events popped from a parser queue and committed in one transaction
+LISTENER_BATCH_SIZE = int(os.environ.get("LISTENER_BATCH_SIZE", default=50))
+# max time in seconds to wait for a batch to fill up once its first event arrived
+LISTENER_BATCH_MAX_WAIT = float(os.environ.get("LISTENER_BATCH_MAX_WAIT", default=0.5))
+# adapt the batch size and wait time to the queue lag, between the min and the max values. 1 enables
+LISTENER_ADAPTIVE_BATCHING = (
+    os.environ.get("LISTENER_ADAPTIVE_BATCHING", default="0") == "1"
+)
+# smallest batch size and wait time used by adaptive batching, the max ones are the settings above
+LISTENER_BATCH_MIN_SIZE = int(os.environ.get("LISTENER_BATCH_MIN_SIZE", default=10))
+LISTENER_BATCH_MIN_WAIT = float(os.environ.get("LISTENER_BATCH_MIN_WAIT", default=0.05))
+# target time in seconds from an event entering redis to its commit
+LISTENER_LATENCY_SLO = float(os.environ.get("LISTENER_LATENCY_SLO", default=2.0))
+# number of concurrent consumer tasks per listener. Each one holds a db connection
+LISTENER_CONSUMERS = int(os.environ.get("LISTENER_CONSUMERS", default=4))
+# drop older copies of an event from a batch if it has a newer one with the same event_url. 0 disables
+LISTENER_COALESCE = os.environ.get("LISTENER_COALESCE", default="1") != "0"
+# pop and decode the next batches while the current ones are written to the db. 1 enables
+LISTENER_PIPELINE = os.environ.get("LISTENER_PIPELINE", default="0") == "1"
+# max number of batches waiting between two pipeline stages
+LISTENER_PIPELINE_DEPTH = int(os.environ.get("LISTENER_PIPELINE_DEPTH", default=4))
+# parser queues consumed by the combined parsers-listener process
+LISTENER_QUEUES = os.environ.get(
+    "LISTENER_QUEUES", default="betcity,fonbet,marathon,pinnacle"
+).split(",")
+# "list" - parsers lpush to a list per bookmaker, one listener process per queue.
+# "stream" - parsers xadd to a redis stream, any number of listeners read it as a consumer group
+LISTENER_TRANSPORT = os.environ.get("LISTENER_TRANSPORT", default="list")
+LISTENER_STREAM_GROUP = os.environ.get("LISTENER_STREAM_GROUP", default="listeners")
+# consumer name in the stream group, has to be unique per listener process
+LISTENER_STREAM_CONSUMER = os.environ.get(
+    "LISTENER_STREAM_CONSUMER", default=f"{socket.gethostname()}-{os.getpid()}"
+)
+# time in seconds after which unacknowledged entries of another listener are taken over
+LISTENER_STREAM_CLAIM_IDLE = float(
+    os.environ.get("LISTENER_STREAM_CLAIM_IDLE", default=60)
+)
+# entries delivered more often are acknowledged and moved to `<queue>:stream:deadletter`
+LISTENER_STREAM_MAX_DELIVERIES = int(
+    os.environ.get("LISTENER_STREAM_MAX_DELIVERIES", default=5)
+)
+# seconds after which idle consumers without pending entries are removed from the group
+LISTENER_STREAM_CONSUMER_TTL = float(
+    os.environ.get("LISTENER_STREAM_CONSUMER_TTL", default=3600)
+)
+# max number of unmatched events per bookmaker kept to be matched again after fixture imports
+DEADLETTER_MAX_SIZE = int(os.environ.get("DEADLETTER_MAX_SIZE", default=10000))
+
 APP_ENV = os.environ.get("APP_ENV", default="prod")
 
 API_HOST = "api-football-v1.p.rapidapi.com"
@@ -45,6 +97,9 @@ if os.environ.get("DB_ECHO"):
 else:
     DB_ECHO = False
 
+# connect through pgbouncer in transaction mode: no client side pool and no prepared statements. 1 enables
+DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", default="0") == "1"
+
 REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")
 REDIS_HOST = os.environ.get("REDIS_HOST")
 REDIS_PORT = os.environ.get("REDIS_PORT")
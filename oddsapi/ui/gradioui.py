@@ -5,7 +5,7 @@ import matplotlib
 from gradio import State
 from pandas import DataFrame
 
-from oddsapi.database.init import SessionLocal
+from oddsapi.database.init import SessionLocal, use_engine_profile
 from oddsapi.filter.fixture import (
     find_filtered_fixtures,
     DeviationStrategy,
@@ -816,8 +816,10 @@ with block:
 
 
 def run():
+    use_engine_profile("ui")
     block.launch(auth=check_auth)
 
 
 if __name__ == "__main__":
+    use_engine_profile("ui")
     block.launch(auth=check_auth)
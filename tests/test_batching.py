@@ -0,0 +1,105 @@
+from oddsapi.parser_import.batching import AdaptiveBatching
+
+
+def batching(**kwargs):
+    options = dict(
+        consumers=2,
+        min_size=10,
+        max_size=500,
+        min_wait=0.05,
+        max_wait=1.0,
+        latency_slo=2.0,
+    )
+    return AdaptiveBatching(**{**options, **kwargs})
+
+
+def test_starts_small():
+    adaptive = batching()
+
+    assert adaptive.batch_size == 10
+    assert adaptive.wait == 1.0
+
+
+def test_backlog_grows_the_batch():
+    adaptive = batching()
+    adaptive.observe(10, 0.01)
+
+    adaptive.adjust(100)
+    assert adaptive.batch_size == 50
+    assert adaptive.wait == 0.05
+
+    adaptive.adjust(400)
+    assert adaptive.batch_size == 200
+
+
+def test_batch_is_bounded_by_max_size():
+    adaptive = batching()
+    adaptive.observe(10, 0.001)
+
+    adaptive.adjust(100_000)
+
+    assert adaptive.batch_size == 500
+
+
+def test_slow_writes_shrink_the_batch():
+    adaptive = batching()
+    adaptive.observe(100, 0.1)
+    adaptive.adjust(10_000)
+    fast_size = adaptive.batch_size
+
+    # 10ms per event, half of the slo fits 100 events
+    for _ in range(50):
+        adaptive.observe(100, 1.0)
+    adaptive.adjust(10_000)
+
+    assert adaptive.batch_size < fast_size
+    assert adaptive.batch_size == 100
+
+
+def test_batch_is_bounded_by_min_size():
+    adaptive = batching()
+    # a second per event, nothing fits in the slo
+    adaptive.observe(10, 10.0)
+
+    adaptive.adjust(10_000)
+    assert adaptive.batch_size == 10
+
+    adaptive.adjust(0)
+    assert adaptive.batch_size == 10
+    assert adaptive.wait == 0.05
+
+
+def test_no_backlog_waits_for_the_batch_to_fill_up():
+    adaptive = batching()
+    adaptive.observe(10, 0.1)
+    adaptive.adjust(1000)
+
+    adaptive.adjust(0)
+
+    assert adaptive.batch_size == 10
+    # half of the slo minus the write time of a batch
+    assert adaptive.wait == 0.9
+
+
+def test_observe_smooths_the_event_time():
+    adaptive = batching()
+    adaptive.observe(10, 0.1)
+    adaptive.observe(10, 1.1)
+    adaptive.observe(0, 5.0)
+
+    assert round(adaptive.event_time, 3) == 0.03
+
+
+def test_estimated_latency():
+    adaptive = batching()
+    adaptive.observe(10, 0.1)
+    adaptive.adjust(200)
+
+    # 200 events backlog split by 2 consumers, min wait, a batch of 100
+    assert round(adaptive.estimated_latency(), 3) == 1.0 + 0.05 + 1.0
+    assert adaptive.summary() == {
+        "batch_size": 100,
+        "wait": 0.05,
+        "lag": 200,
+        "latency": 2.05,
+    }
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from oddsapi.database.repository.bet import upsert_bets
+
+
+class RecordingSession:
+    """Keeps the executed statements instead of running them"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return self
+
+    def all(self):
+        return []
+
+
+def upserted_rows(bets):
+    session = RecordingSession()
+    asyncio.run(upsert_bets(bets, session))
+    (stmt,) = session.statements
+    params = stmt.compile(dialect=postgresql.dialect()).params
+
+    rows = []
+    for position in range(len(bets)):
+        if f"fixture_id_m{position}" not in params:
+            break
+        rows.append(
+            (
+                params[f"fixture_id_m{position}"],
+                params[f"bookmaker_m{position}"],
+                params[f"received_at_m{position}"],
+                params.get(f"outcomes_m{position}"),
+            )
+        )
+
+    return rows
+
+
+def received(second):
+    return datetime(2026, 10, 20, 12, 0, second, tzinfo=timezone.utc)
+
+
+def test_rows_are_sorted_by_fixture_and_bookmaker():
+    rows = upserted_rows(
+        [
+            {"fixture_id": 2, "bookmaker": "fonbet", "received_at": received(1)},
+            {"fixture_id": 1, "bookmaker": "pinnacle", "received_at": received(1)},
+            {"fixture_id": 1, "bookmaker": "betcity", "received_at": received(1)},
+        ]
+    )
+
+    assert [row[:2] for row in rows] == [
+        (1, "betcity"),
+        (1, "pinnacle"),
+        (2, "fonbet"),
+    ]
+
+
+def test_newest_bet_of_a_fixture_wins():
+    rows = upserted_rows(
+        [
+            {
+                "fixture_id": 1,
+                "bookmaker": "betcity",
+                "received_at": received(2),
+                "outcomes": {"home_team": 1.6},
+            },
+            {
+                "fixture_id": 1,
+                "bookmaker": "betcity",
+                "received_at": received(1),
+                "outcomes": {"home_team": 1.5},
+            },
+            {
+                "fixture_id": 1,
+                "bookmaker": "betcity",
+                "received_at": received(3),
+                "outcomes": {"home_team": 1.7},
+            },
+        ]
+    )
+
+    assert rows == [(1, "betcity", received(3), {"home_team": 1.7})]
+
+
+def test_missing_received_at_is_now():
+    before = datetime.now(timezone.utc)
+    ((_, _, received_at, _),) = upserted_rows(
+        [{"fixture_id": 1, "bookmaker": "betcity"}]
+    )
+
+    assert received_at >= before
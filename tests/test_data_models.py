@@ -0,0 +1,32 @@
+import msgspec
+import pytest
+
+from oddsapi.database.data_models import OutcomeOdds, parse_odds
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1.85", 1.85),
+        (" 2.1 ", 2.1),
+        ("1,85", 1.85),
+        ("−0.5", -0.5),
+        ("‑1,5", -1.5),
+        (2.5, 2.5),
+        (None, None),
+        ("", None),
+        ("  ", None),
+        ("-", None),
+        ("n/a", None),
+    ],
+)
+def test_parse_odds(value, expected):
+    assert parse_odds(value) == expected
+
+
+def test_outcome_odds_are_parsed_on_decode():
+    odds = msgspec.json.decode(
+        b'{"home_team": "1,9", "draw": "-", "away_team": 4.2}', type=OutcomeOdds
+    )
+
+    assert odds == OutcomeOdds(home_team=1.9, draw=None, away_team=4.2)
@@ -0,0 +1,17 @@
+import datetime
+
+from oddsapi.parser_import.dateparse import parse_event_datetime, parse_iso
+
+
+def test_iso():
+    assert parse_iso("2026-10-20T19:00:00+03:00") == datetime.datetime(
+        2026, 10, 20, 19, tzinfo=datetime.timezone(datetime.timedelta(hours=3))
+    )
+    assert parse_iso("20.10.2026 19:00") is None
+
+
+def test_other_formats_go_through_dateparser():
+    assert parse_event_datetime("20.10.2026 19:00") == datetime.datetime(
+        2026, 10, 20, 19
+    )
+    assert parse_event_datetime("not a date") is None
@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+
+from oddsapi.parser_import.fixture_index import FixtureIndex
+
+KICKOFF = datetime.datetime.now(datetime.timezone.utc).replace(
+    hour=12, minute=0, second=0, microsecond=0
+) + datetime.timedelta(days=2)
+
+
+@pytest.fixture
+def index():
+    index = FixtureIndex()
+    index.add(1, KICKOFF, "Manchester United", "Liverpool FC", 10, 11)
+    index.add(2, KICKOFF, "Dynamo Kyiv", "Shakhtar Donetsk", 12, 13)
+    return index
+
+
+def match(index, home_team, away_team, date=KICKOFF):
+    matched = index.match_with_score(home_team, away_team, date)
+    return matched and (matched[0].id, round(matched[1], 2))
+
+
+def test_exact_names(index):
+    assert match(index, "Manchester United", "Liverpool FC") == (1, 1.0)
+    assert match(index, "MANCHESTER UNITED", "liverpool fc") == (1, 1.0)
+
+
+def test_substring(index):
+    assert match(index, "Manchester", "Liverpool") == (1, 1.0)
+
+
+def test_other_day(index):
+    assert (
+        match(
+            index,
+            "Manchester United",
+            "Liverpool FC",
+            KICKOFF + datetime.timedelta(days=1),
+        )
+        is None
+    )
+
+
+def test_shared_words(index):
+    assert match(index, "Dinamo Kyiv", "Shakhtar Donetsk") == (2, 0.67)
+
+
+def test_below_min_score(index):
+    # dynamo 1/3, shakhtar 1/2
+    assert match(index, "Dynamo Lviv", "Shakhtar") is None
+
+
+def test_below_margin(index):
+    index.add(3, KICKOFF, "Dynamo Kyiv II", "Shakhtar Donetsk II", 14, 15)
+
+    # 0.5 for the senior team, 0.33 for the reserves
+    assert match(index, "Dynamo", "Shakhtar") is None
+    # the qualifier tells them apart
+    assert match(index, "Dinamo Kyiv II", "Shakhtar Donetsk II") == (3, 0.75)
+    assert match(index, "Dinamo Kyiv", "Shakhtar Donetsk") == (2, 0.67)
+
+
+def test_removed_fixture(index):
+    index.remove(1)
+
+    assert match(index, "Manchester United", "Liverpool FC") is None
+    assert len(index) == 1
+
+
+def test_started_fixture(index):
+    started = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        minutes=1
+    )
+    index.add(3, started, "Arsenal", "Chelsea", 14, 15)
+
+    assert match(index, "Arsenal", "Chelsea", started) is None
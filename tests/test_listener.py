@@ -0,0 +1,64 @@
+import msgspec
+
+from oddsapi.database.data_models import BetcityEvent, OutcomeOdds
+from oddsapi.parser_import.listener import BetcityListener
+from oddsapi.parser_import.wire import encode_requeued
+
+
+def event(event_url, home_team_odds):
+    return BetcityEvent(
+        event_url=event_url,
+        datetime="2026-10-20 19:00",
+        home_team_name="Dynamo Kyiv",
+        away_team_name="Shakhtar Donetsk",
+        outcome_odds=OutcomeOdds(home_team=home_team_odds),
+    )
+
+
+def test_coalesce_keeps_the_last_copy():
+    listener = BetcityListener()
+    events = [event("/a", 1.5), event("/b", 2.0), event("/a", 1.6), event("/c", 3.0)]
+
+    events, received_at = listener.coalesce_events(events, [1.0, 2.0, 3.0, 4.0])
+
+    assert [(e.event_url, e.outcome_odds.home_team) for e in events] == [
+        ("/b", 2.0),
+        ("/a", 1.6),
+        ("/c", 3.0),
+    ]
+    assert received_at == [2.0, 3.0, 4.0]
+    assert listener.stats["coalesced"] == 1
+
+
+def test_coalesce_keeps_events_without_url():
+    listener = BetcityListener()
+    events = [event(None, 1.5), event(None, 1.6)]
+
+    coalesced, received_at = listener.coalesce_events(events, [1.0, 2.0])
+
+    assert coalesced == events
+    assert received_at == [1.0, 2.0]
+    assert listener.stats["coalesced"] == 0
+
+
+def test_coalesce_keeps_the_newest_copy_of_a_requeued_event():
+    listener = BetcityListener()
+    # a dead letter received at 1.0 was requeued behind a copy received at 2.0
+    events = [event("/a", 1.6), event("/a", 1.5)]
+
+    events, received_at = listener.coalesce_events(events, [2.0, 1.0])
+
+    assert [e.outcome_odds.home_team for e in events] == [1.6]
+    assert received_at == [2.0]
+
+
+def test_requeued_payload_keeps_its_receive_time():
+    listener = BetcityListener()
+    payload = msgspec.json.encode(event("/a", 1.5))
+
+    events, received_at = listener.decode_received(
+        [encode_requeued(payload, 1.0), payload], [5.0, 6.0]
+    )
+
+    assert events == [event("/a", 1.5), event("/a", 1.5)]
+    assert received_at == [1.0, 6.0]
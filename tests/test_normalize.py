@@ -0,0 +1,34 @@
+from oddsapi.parser_import.normalize import clean_name, normalize_name, name_tokens
+
+
+def test_clean_name():
+    assert clean_name("  Nacional (Montevideo) ") == "Nacional Montevideo"
+    assert clean_name("Bayern\tMünchen") == "Bayern München"
+
+
+def test_normalize_name():
+    assert normalize_name("Bayern München") == "bayern munchen"
+    assert normalize_name("Bodø/Glimt") == "bodo/glimt"
+    assert normalize_name("Górnik Łęczna") == "gornik leczna"
+
+
+def test_ban_words_are_dropped():
+    assert name_tokens("Manchester United") == {"manchester"}
+    assert name_tokens("Real Madrid") == {"madrid"}
+
+
+def test_short_words_of_long_names_are_dropped():
+    assert name_tokens("AC Milan") == {"milan"}
+    assert name_tokens("Dynamo Kyiv") == {"dynamo", "kyiv"}
+
+
+def test_single_word_names_are_kept():
+    assert name_tokens("PSV") == {"psv"}
+    assert name_tokens("FC") == {"fc"}
+
+
+def test_qualifiers_are_kept():
+    assert name_tokens("Spain U21") == {"spain", "u21"}
+    assert name_tokens("Arsenal W") == {"arsenal", "w"}
+    assert name_tokens("Dynamo Kyiv II") == {"dynamo", "kyiv", "ii"}
+    assert name_tokens("Spain U21") != name_tokens("Spain")
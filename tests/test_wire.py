@@ -0,0 +1,34 @@
+import msgspec
+
+from oddsapi.database.data_models import BetcityEvent, OutcomeOdds
+from oddsapi.parser_import.wire import (
+    EventDecoder,
+    encode_msgpack,
+    encode_requeued,
+    split_requeued,
+)
+
+EVENT = BetcityEvent(
+    event_url="/a",
+    datetime="2026-10-20 19:00",
+    home_team_name="Dynamo Kyiv",
+    away_team_name="Shakhtar Donetsk",
+    outcome_odds=OutcomeOdds(home_team=1.5),
+)
+
+
+def test_json_and_msgpack():
+    decoder = EventDecoder(BetcityEvent)
+
+    assert decoder.decode(msgspec.json.encode(EVENT)) == EVENT
+    assert decoder.decode(encode_msgpack(EVENT)) == EVENT
+
+
+def test_requeued():
+    decoder = EventDecoder(BetcityEvent)
+    for payload in (msgspec.json.encode(EVENT), encode_msgpack(EVENT)):
+        requeued = encode_requeued(payload, 1760000000.25)
+
+        assert split_requeued(requeued) == (payload, 1760000000.25)
+        assert split_requeued(payload) == (payload, None)
+        assert decoder.decode(requeued) == EVENT